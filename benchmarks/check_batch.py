@@ -0,0 +1,79 @@
+"""Property check for docassemble.income.batch: for many randomly generated sessions, the vectorized totals must
+equal the per-object IncomeList/JobList methods rounded to the cent. Exits with status 1 on any mismatch.
+
+    python benchmarks/check_batch.py [--sessions 200] [--seed 1]
+"""
+import argparse
+import random
+import sys
+from decimal import Decimal, ROUND_HALF_UP
+
+import standin
+
+TYPES = ['SSI', 'SSDI', 'rent', 'wages', 'other']
+OWNERS = ['client', 'spouse', 'child']
+PERIODS = [1, 4, 12, 13, 24, 26, 52]
+
+def cents(number):
+    return Decimal(number).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+def random_amount(rng):
+    """Mostly whole cents, sometimes an amount with more decimal places, to exercise the exact fallback"""
+    if rng.random() < 0.1:
+        return rng.randint(0, 10 ** 7) / 1000.0
+    return rng.randint(0, 10 ** 6) / 100.0
+
+def random_session(income, rng, index):
+    jobs = income.JobList('jobs' + str(index), auto_gather=False, gathered=True)
+    for item in range(rng.randint(0, 12)):
+        attributes = dict(type=rng.choice(TYPES), owner=rng.choice(OWNERS), period=rng.choice(PERIODS), net=random_amount(rng))
+        if rng.random() < 0.3:
+            attributes.update(is_hourly=True, hourly_rate=random_amount(rng), hours_per_period=rng.randint(1, 80))
+        else:
+            attributes.update(is_hourly=False, value=random_amount(rng))
+        jobs.appendObject(**attributes)
+    return jobs
+
+def check(income, batch, sessions, period):
+    failures = list()
+    by_type_owner = batch.batch_totals(sessions, period_to_use=period, by=('type', 'owner'))
+    by_type = batch.batch_totals(sessions, period_to_use=period, by='type')
+    overall = batch.batch_totals(sessions, period_to_use=period, by=None)
+    net = batch.batch_totals(sessions, period_to_use=period, by='type', field='net')
+    for index, session in enumerate(sessions):
+        expected = cents(session.total(period_to_use=period))
+        if overall[index] != expected:
+            failures.append((index, period, None, overall[index], expected))
+        for type_name in TYPES:
+            expected = cents(session.total(period_to_use=period, type=type_name))
+            if by_type[index].get(type_name, Decimal('0.00')) != expected:
+                failures.append((index, period, type_name, by_type[index].get(type_name), expected))
+            expected = cents(session.net_total(period_to_use=period, type=type_name))
+            if net[index].get(type_name, Decimal('0.00')) != expected:
+                failures.append((index, period, ('net', type_name), net[index].get(type_name), expected))
+            for owner in OWNERS:
+                expected = cents(session.total(period_to_use=period, type=type_name, owner=owner))
+                if by_type_owner[index].get((type_name, owner), Decimal('0.00')) != expected:
+                    failures.append((index, period, (type_name, owner), by_type_owner[index].get((type_name, owner)), expected))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    standin.install()
+    import docassemble.income.income as income
+    import docassemble.income.batch as batch
+    rng = random.Random(args.seed)
+    sessions = [random_session(income, rng, index) for index in range(args.sessions)]
+    failures = list()
+    for period in PERIODS + [0]:
+        failures.extend(check(income, batch, sessions, period))
+    for failure in failures[:20]:
+        sys.stderr.write("MISMATCH session %d period %d group %r: batch %s, per-object %s\n" % failure)
+    sys.stdout.write("%d sessions checked with%s NumPy, %d mismatches\n" % (args.sessions, '' if batch._load_numpy() is not None else 'out', len(failures)))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
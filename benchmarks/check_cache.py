@@ -0,0 +1,69 @@
+"""Check that cached totals and the type and owner index follow changes to a list's membership that keep its
+length the same, e.g. remove() followed by append(). Each change is made to an IncomeList and a PlainIncomeList
+after their totals and index have been cached, and the cached answers are compared with a fresh list holding the
+same items. Exits with status 1 on any mismatch.
+
+    python benchmarks/check_cache.py
+"""
+import sys
+
+import standin
+
+def answers(the_list):
+    """Returns the cached results the check compares"""
+    return {'total': the_list.total(), 'types': the_list.types(), 'owners': the_list.owners(),
+            'owners[rent]': the_list.owners(type='rent'), 'total[rent]': the_list.total(type='rent'),
+            'matches[rent]': [item.type for item in the_list.matches('rent').elements],
+            'matches[SSI]': [item.type for item in the_list.matches('SSI').elements],
+            'summarize': sorted(the_list.summarize().keys())}
+
+def swap_remove_append(the_list, first, second):
+    the_list.remove(first)
+    the_list.append(second)
+
+def swap_pop_append(the_list, first, second):
+    the_list.pop()
+    the_list.append(second)
+
+def swap_setitem(the_list, first, second):
+    the_list[len(the_list) - 1] = second
+
+def swap_clear_extend(the_list, first, second):
+    kept = [item for item in the_list.elements if item is not first]
+    the_list.clear()
+    the_list.extend(kept + [second])
+
+def swap_pop_insert(the_list, first, second):
+    the_list.pop()
+    the_list.insert(0, second)
+
+SWAPS = (swap_remove_append, swap_pop_append, swap_setitem, swap_clear_extend, swap_pop_insert)
+
+def main():
+    standin.install()
+    import docassemble.income.income as income
+    from docassemble.income.core import PlainIncomeList
+    makers = (('IncomeList', lambda: income.IncomeList('incomes', auto_gather=False, gathered=True),
+               lambda **kwargs: income.Income('item', **kwargs)),
+              ('PlainIncomeList', PlainIncomeList, lambda **kwargs: PlainIncomeList.record_type(**kwargs)))
+    failures = 0
+    for name, make_list, make_item in makers:
+        for swap in SWAPS:
+            the_list = make_list()
+            the_list.appendObject(type='wages', value=50, period=12, owner='b')
+            first = the_list.appendObject(type='SSI', value=100, period=12, owner='c')
+            second = make_item(type='rent', value=500, period=12, owner='d')
+            answers(the_list)
+            swap(the_list, first, second)
+            expected = make_list()
+            expected.append(*the_list.elements)
+            got, wanted = answers(the_list), answers(expected)
+            for key in wanted:
+                if got[key] != wanted[key]:
+                    failures += 1
+                    sys.stderr.write("MISMATCH %s %s %s: cached %r, expected %r\n" % (name, swap.__name__, key, got[key], wanted[key]))
+    sys.stdout.write("%d swaps checked, %d mismatches\n" % (len(makers) * len(SWAPS), failures))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
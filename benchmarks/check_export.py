@@ -0,0 +1,88 @@
+"""Round-trip check for docassemble.income.export: writes incomes, jobs, assets (including assets whose optional
+period was left blank) and a ledger with write_ndjson(), loads them back with load_ndjson(), with and without
+compact=True, and checks that the reloaded lists export the same records and have the same totals. Also checks
+that to_json() works for the same lists. Exits with status 1 on any mismatch.
+
+    python benchmarks/check_export.py
+"""
+import datetime
+import io
+import json
+import sys
+
+import standin
+
+def make_lists(income):
+    incomes = income.IncomeList('incomes', auto_gather=False, gathered=True)
+    incomes.appendObject(type='SSI', value=914, period=12, owner='client')
+    incomes.appendObject(type='rent', value=150.5, period=52, owner='spouse')
+    jobs = income.JobList('jobs', auto_gather=False, gathered=True)
+    jobs.appendObject(type='wages', value=2400.5, period=24, net=1800.75, is_hourly=False, owner='client', employer='ACME')
+    jobs.appendObject(type='wages', hourly_rate=15.25, hours_per_period=40, period=52, net=480.1, is_hourly=True, owner='spouse')
+    assets = income.AssetList('assets', auto_gather=False, gathered=True)
+    assets.appendObject(type='savings', value=12, period=12, balance=1000, owner='client')
+    assets.appendObject(type='checking', value=0, period=None, balance=250.25, owner='client')
+    assets.appendObject(type='cd', balance=5000, owner='spouse')
+    ledger = income.Ledger('ledger', auto_gather=False, gathered=True)
+    for day, value, transaction_type in ((3, 100, 'income'), (1, 40, 'expense'), (9, 60.5, 'income')):
+        ledger.add_entry(value=value, date=datetime.date(2024, 1, day), transaction_type=transaction_type)
+    return {'incomes': incomes, 'jobs': jobs, 'assets': assets, 'ledger': ledger}
+
+def empty_lists(income):
+    return {'incomes': income.IncomeList('incomes', auto_gather=False, gathered=True),
+            'jobs': income.JobList('jobs', auto_gather=False, gathered=True),
+            'assets': income.AssetList('assets', auto_gather=False, gathered=True),
+            'ledger': income.Ledger('ledger', auto_gather=False, gathered=True)}
+
+def normalized(records):
+    """Returns the records with numbers as floats and dates as dates, since loading parses amounts and dates"""
+    def value(item):
+        if isinstance(item, bool) or item is None or isinstance(item, str):
+            return item
+        if isinstance(item, datetime.datetime):
+            return item.date()
+        if isinstance(item, datetime.date):
+            return item
+        return float(item)
+    return [dict((key, value(item)) for key, item in record.items()) for record in records]
+
+def totals(lists):
+    return {'incomes': lists['incomes'].total(period_to_use=12), 'jobs': lists['jobs'].net_total(period_to_use=12),
+            'assets': lists['assets'].balance_total(), 'ledger': lists['ledger'].total()}
+
+def main():
+    standin.install()
+    import docassemble.income.income as income
+    import docassemble.income.export as export
+    failures = list()
+    original = make_lists(income)
+    for name, the_list in original.items():
+        if name != 'ledger':
+            try:
+                json.loads(the_list.to_json())
+            except Exception as err:
+                failures.append("%s.to_json() failed: %r" % (name, err))
+    output = io.StringIO()
+    export.write_ndjson([('client', original)], output)
+    for compact in (False, True):
+        loaded = empty_lists(income)
+        results = export.load_ndjson(io.StringIO(output.getvalue()), lambda client, name: loaded[name], compact=compact)
+        for key, result in results.items():
+            if result.rejected:
+                failures.append("compact=%s %s rejected %r" % (compact, key, result.rejected))
+        for name in original:
+            before = normalized(export.iter_records(original[name]))
+            after = normalized(export.iter_records(loaded[name]))
+            if before != after:
+                failures.append("compact=%s %s records differ: %r, reloaded %r" % (compact, name, before, after))
+        expected, got = totals(original), totals(loaded)
+        for name in expected:
+            if expected[name] != got[name]:
+                failures.append("compact=%s %s total %s, reloaded %s" % (compact, name, expected[name], got[name]))
+    for failure in failures:
+        sys.stderr.write("MISMATCH " + failure + "\n")
+    sys.stdout.write("%d lists round-tripped, %d mismatches\n" % (len(original), len(failures)))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Scaling check for import_records() into a Ledger and a PlainLedger: importing rows in date order must take
+time roughly proportional to the number of rows, with and without compact=True. Times each import at size and at
+four times size, and exits with status 1 if the larger import took more than --limit times as long per row, or if
+the compact and full imports disagree on the running totals.
+
+    python benchmarks/check_import.py [--size 1000] [--limit 2.5]
+"""
+import argparse
+import datetime
+import sys
+import time
+
+import standin
+
+def make_rows(size):
+    start = datetime.date(2020, 1, 1)
+    return [{'value': 1 + index % 500, 'date': start + datetime.timedelta(days=index // 3),
+             'transaction_type': 'expense' if index % 3 else 'income'} for index in range(size)]
+
+def time_import(make_ledger, rows, compact):
+    """Returns the seconds per row of importing rows into a new ledger, and the ledger's final running total"""
+    from docassemble.income.core import import_records
+    ledger = make_ledger()
+    start = time.perf_counter()
+    import_records(ledger, rows, format='records', compact=compact)
+    return (time.perf_counter() - start) / len(rows), ledger.elements[-1].running_total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--limit', type=float, default=2.5)
+    args = parser.parse_args()
+    standin.install()
+    import docassemble.income.income as income
+    from docassemble.income.core import PlainLedger
+    ledgers = (('Ledger', lambda: income.Ledger('ledger', auto_gather=False, gathered=True)), ('PlainLedger', PlainLedger))
+    failed = False
+    for name, make_ledger in ledgers:
+        totals = dict()
+        for compact in (False, True):
+            small, total = time_import(make_ledger, make_rows(args.size), compact)
+            large, totals[compact] = time_import(make_ledger, make_rows(4 * args.size), compact)
+            ratio = large / small
+            if ratio > args.limit:
+                failed = True
+            sys.stdout.write("%-11s compact=%-5s %7.1fus/row at %d rows, %7.1fus/row at %d rows (x%.2f)%s\n"
+                             % (name, compact, small * 1e6, args.size, large * 1e6, 4 * args.size, ratio,
+                                ' TOO SLOW' if ratio > args.limit else ''))
+        if totals[False] != totals[True]:
+            failed = True
+            sys.stdout.write("%s running totals differ: %s full, %s compact\n" % (name, totals[False], totals[True]))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
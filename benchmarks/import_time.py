@@ -0,0 +1,73 @@
+"""Times a fresh import of each docassemble.income module in a new interpreter, and checks that core, batch and
+export do not import docassemble itself.
+
+    python benchmarks/import_time.py [--repeat 10]
+
+The docassemble namespace package (whose __init__ loads pkg_resources) is timed on its own, and is imported before
+timing each of the other modules. docassemble.income.income is imported with the stand-ins from standin.py when
+docassemble is not installed, so its time then leaves out the cost of docassemble.base.util, which a real worker
+pays on top.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import standin
+
+MODULES = ('docassemble', 'docassemble.income.core', 'docassemble.income.batch', 'docassemble.income.export', 'docassemble.income.income')
+
+# Modules that must load without docassemble
+STANDALONE = ('docassemble.income.core', 'docassemble.income.batch', 'docassemble.income.export')
+
+# Modules that are imported with the stand-ins when docassemble is not installed
+NEEDS_DOCASSEMBLE = ('docassemble.income.income',)
+
+PROBE = """
+import sys, time, json
+sys.path.insert(0, %(root)r)
+if %(stand_ins)r:
+    sys.path.insert(0, %(benchmarks)r)
+    import standin
+    standin.install()
+if %(module)r != 'docassemble':
+    import docassemble
+before = set(sys.modules)
+start = time.perf_counter()
+import %(module)s
+elapsed = time.perf_counter() - start
+loaded = sorted(set(sys.modules) - before)
+json.dump({'seconds': elapsed, 'modules': len(loaded),
+           'docassemble_base': any(name.startswith('docassemble.base') for name in loaded)}, sys.stdout)
+"""
+
+def time_import(module, stand_ins):
+    code = PROBE % {'root': standin.ROOT, 'benchmarks': os.path.dirname(os.path.abspath(__file__)),
+                    'stand_ins': stand_ins, 'module': module}
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return json.loads(output.decode('utf-8'))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    stand_ins = standin.install()
+    results = list()
+    failed = False
+    for module in MODULES:
+        runs = [time_import(module, stand_ins and module in NEEDS_DOCASSEMBLE) for index in range(args.repeat)]
+        result = {'module': module, 'median_seconds': statistics.median(run['seconds'] for run in runs),
+                  'modules_loaded': runs[0]['modules'], 'imports_docassemble': runs[0]['docassemble_base']}
+        if module in STANDALONE and result['imports_docassemble']:
+            failed = True
+        results.append(result)
+        sys.stderr.write("%-30s %8.2fms %4d modules%s\n" % (module, result['median_seconds'] * 1000, result['modules_loaded'],
+                                                         ' (imports docassemble)' if result['imports_docassemble'] else ''))
+    json.dump({'stand_ins': stand_ins, 'repeat': args.repeat, 'results': results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
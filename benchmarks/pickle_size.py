@@ -0,0 +1,50 @@
+"""Compares the size of the pickled interview state for lists of DAObjects and the same lists after compact().
+
+    python benchmarks/pickle_size.py [--sizes 100,1000,10000]
+"""
+import argparse
+import json
+import pickle
+import sys
+
+import standin
+
+def make_incomes(income, size):
+    incomes = income.IncomeList('incomes', auto_gather=False, gathered=True)
+    for index in range(size):
+        incomes.appendObject(type=['wages', 'SSI', 'rent', 'other'][index % 4], owner='owner ' + str(index % 3),
+                             value=float(100 + index % 997) + 0.25, period=[12, 52, 26, 1][index % 4])
+    return incomes
+
+def make_ledger(income, size):
+    ledger = income.Ledger('ledger', auto_gather=False, gathered=True)
+    for index in range(size):
+        ledger.appendObject(value=float(index % 500) + 0.5, date=index,
+                            transaction_type='expense' if index % 3 else 'income', type='statement')
+    ledger.calculate()
+    return ledger
+
+def measure(make, income, size):
+    items = make(income, size)
+    before = len(pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL))
+    items.compact()
+    after = len(pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL))
+    return {'size': size, 'pickled_bytes': before, 'compact_pickled_bytes': after, 'ratio': round(after / float(before), 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='100,1000,10000')
+    args = parser.parse_args()
+    stand_ins = standin.install()
+    import docassemble.income.income as income
+    results = {'stand_ins': stand_ins, 'results': []}
+    for size in [int(size) for size in args.sizes.split(',')]:
+        for name, make in (('IncomeList', make_incomes), ('Ledger', make_ledger)):
+            result = measure(make, income, size)
+            result['list'] = name
+            results['results'].append(result)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+if __name__ == '__main__':
+    main()
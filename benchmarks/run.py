@@ -0,0 +1,189 @@
+"""Benchmarks the aggregation and serialization hot paths of docassemble.income.income at several list sizes
+and prints the results as JSON.
+
+    python benchmarks/run.py [--sizes 10,100,1000,10000,100000] [--output results.json]
+                             [--compare baseline.json] [--tolerance 1.5]
+
+Each benchmark is timed "cold" (list caches cleared before every call, so the work is really done) and,
+where the method is memoized, "warm". With --compare, any benchmark whose cold time grew by more than
+--tolerance times the baseline is reported and the exit status is 1, so the suite can guard against regressions.
+Runs without a docassemble server by using the stand-ins in standin.py.
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+
+import standin
+
+INCOME_TYPES = ['SSR', 'SSDI', 'SSI', 'pension', 'TAFDC', 'public assistance', 'SNAP', 'rent', 'room and board',
+                'child support', 'alimony', 'other support', 'other']
+ASSET_TYPES = ['savings', 'cd', 'ira', 'mutual fund', 'stocks', 'trust', 'checking', 'other']
+OWNERS = ['client', 'spouse', 'child']
+PERIODS = [12, 1, 52, 24, 26, 4]
+
+def make_incomes(income, size):
+    incomes = income.IncomeList('incomes', auto_gather=False, gathered=True)
+    for index in range(size):
+        incomes.appendObject(type=INCOME_TYPES[index % len(INCOME_TYPES)], owner=OWNERS[index % len(OWNERS)],
+                             value=float(50 + index % 1000) + 0.25, period=PERIODS[index % len(PERIODS)])
+    return incomes
+
+def make_assets(income, size):
+    assets = income.AssetList('assets', auto_gather=False, gathered=True)
+    for index in range(size):
+        assets.appendObject(type=ASSET_TYPES[index % len(ASSET_TYPES)], owner=OWNERS[index % len(OWNERS)],
+                            value=float(index % 50), period=12, balance=float(1000 + index % 5000),
+                            market_value=float(2000 + index % 7000))
+    return assets
+
+def make_jobs(income, size):
+    jobs = income.JobList('jobs', auto_gather=False, gathered=True)
+    for index in range(size):
+        if index % 2:
+            jobs.appendObject(type='wages', owner=OWNERS[index % len(OWNERS)], is_hourly=True, hourly_rate=15.25,
+                              hours_per_period=40, period=52, net=480.10)
+        else:
+            jobs.appendObject(type='wages', owner=OWNERS[index % len(OWNERS)], is_hourly=False, value=2400.50,
+                              period=24, net=1800.75)
+    return jobs
+
+def make_ledger(income, size):
+    ledger = income.Ledger('ledger', auto_gather=False, gathered=True)
+    for index in range(size):
+        ledger.appendObject(value=float(index % 500) + 0.5, date=(index * 7919) % size,
+                            transaction_type='expense' if index % 3 else 'income')
+    return ledger
+
+def time_call(function, repeat, setup=None):
+    """Returns the best and median wall time in seconds of repeat calls to function"""
+    timings = list()
+    for iteration in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {'best': timings[0], 'median': timings[len(timings) // 2], 'repeat': repeat}
+
+def render_income_summary_per_row(income, incomes):
+    """The income_summary_table as it was written before summarize(): one total() per row"""
+    return [(income_type, incomes.total(type=income_type, period_to_use=12)) for income_type in income.non_wage_income_list().keys()]
+
+def render_income_summary(income, incomes):
+    """The income_summary_table as financial_statement.yml renders it"""
+    summary = incomes.summarize(period_to_use=12)
+    return [(row.type, row.total) for row in summary.rows(income.non_wage_income_list().keys())]
+
+def render_assets_summary_per_row(income, assets):
+    return [(asset_type, assets.owners(type=asset_type), assets.balance_total(type=asset_type), assets.total(type=asset_type))
+            for asset_type in income.asset_type_list().keys()]
+
+def render_assets_summary(income, assets):
+    summary = assets.summarize(fields=['total', 'balance'])
+    return [(row.type, row.owners, row.balance, row.total) for row in summary.rows(income.asset_type_list().keys())]
+
+def make_sessions(income, size):
+    """Splits size items across sessions of ten items each"""
+    return [make_incomes(income, min(10, size - start)) for start in range(0, size, 10)]
+
+def per_object_session_totals(sessions):
+    return [dict((income_type, session.total(period_to_use=12, type=income_type)) for income_type in session.types()) for session in sessions]
+
+def benchmarks(income, size):
+    """Returns a list of (name, function, the list it reads, memoized) tuples for lists of the given size"""
+    import docassemble.income.batch as batch
+    import docassemble.income.export as export
+    incomes = make_incomes(income, size)
+    assets = make_assets(income, size)
+    jobs = make_jobs(income, size)
+    ledger = make_ledger(income, size)
+    sessions = make_sessions(income, size)
+    packed = batch.pack(sessions)
+    return [
+        ('IncomeList.total', lambda: incomes.total(period_to_use=12), incomes, True),
+        ('IncomeList.total[type]', lambda: incomes.total(period_to_use=12, type='SSI'), incomes, True),
+        ('IncomeList.total[type list]', lambda: incomes.total(period_to_use=12, type=['SSI', 'SSDI', 'rent']), incomes, True),
+        ('IncomeList.total[type, owner]', lambda: incomes.total(period_to_use=12, type='SSI', owner='client'), incomes, True),
+        ('IncomeList.balance_total', lambda: assets.balance_total(), assets, True),
+        ('IncomeList.market_value_total', lambda: assets.market_value_total(), assets, True),
+        ('IncomeList.summarize', lambda: incomes.summarize(period_to_use=12, by_owner=True), incomes, True),
+        ('IncomeList.matches', lambda: incomes.matches('SSI'), incomes, False),
+        ('IncomeList.owners', lambda: incomes.owners(type='SSI'), incomes, True),
+        ('IncomeList.to_json', lambda: incomes.to_json(), incomes, False),
+        ('export.write_ndjson', lambda: export.write_ndjson([('client', {'incomes': incomes, 'jobs': jobs})], io.StringIO()), incomes, False),
+        ('JobList.gross_total', lambda: jobs.gross_total(period_to_use=12), jobs, True),
+        ('JobList.net_total', lambda: jobs.net_total(period_to_use=12), jobs, True),
+        ('Ledger.calculate', lambda: ledger.calculate(), ledger, False),
+        ('Ledger.total', lambda: ledger.total(), ledger, True),
+        ('income_summary_table[per row]', lambda: render_income_summary_per_row(income, incomes), incomes, False),
+        ('income_summary_table', lambda: render_income_summary(income, incomes), incomes, True),
+        ('assets_summary_table[per row]', lambda: render_assets_summary_per_row(income, assets), assets, False),
+        ('assets_summary_table', lambda: render_assets_summary(income, assets), assets, True),
+        ('sessions.total[per object]', lambda: per_object_session_totals(sessions), _Sessions(sessions), False),
+        ('batch.pack', lambda: batch.pack(sessions), _Sessions(sessions), False),
+        ('batch.totals', lambda: packed.totals(period_to_use=12, by='type'), _Sessions(sessions), False),
+    ]
+
+class _Sessions(object):
+    """Clears the caches of every list in a batch of sessions before a cold run"""
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    def _invalidate_cache(self):
+        for session in self.sessions:
+            session._invalidate_cache()
+
+def run(sizes):
+    stand_ins = standin.install()
+    import docassemble.income.income as income
+    results = list()
+    for size in sizes:
+        repeat = max(3, min(50, 100000 // max(size, 1)))
+        for name, function, target, memoized in benchmarks(income, size):
+            result = {'name': name, 'size': size}
+            result['cold'] = time_call(function, repeat, setup=target._invalidate_cache)
+            if memoized:
+                function()
+                result['warm'] = time_call(function, repeat)
+            results.append(result)
+            sys.stderr.write("%-32s %7d  %.6fs\n" % (name, size, result['cold']['best']))
+    return {'stand_ins': stand_ins, 'python': platform.python_version(), 'results': results}
+
+def compare(report, baseline, tolerance):
+    """Returns a list of descriptions of benchmarks whose best cold time exceeds tolerance times the baseline"""
+    previous = dict(((result['name'], result['size']), result['cold']['best']) for result in baseline['results'])
+    regressions = list()
+    for result in report['results']:
+        before = previous.get((result['name'], result['size']))
+        if before and result['cold']['best'] > before * tolerance:
+            regressions.append("%s at %d items: %.6fs, was %.6fs" % (result['name'], result['size'], result['cold']['best'], before))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,100,1000,10000,100000')
+    parser.add_argument('--output', help='write the JSON results to this file instead of standard output')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args()
+    report = run([int(size) for size in args.sizes.split(',')])
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            sys.stderr.write("REGRESSION: " + regression + "\n")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
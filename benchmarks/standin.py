@@ -0,0 +1,216 @@
+"""Lightweight stand-ins for the parts of docassemble that docassemble.income.income imports, so the
+benchmarks can run without a docassemble server. install() only registers them if docassemble.base is
+not importable; on a docassemble server the real classes are used.
+
+The stand-ins keep the attributes a real DAObject pickles (instanceName, attrList,
+has_nonrandom_instance_name) so serialization sizes are comparable, but they never ask questions."""
+import os
+import sys
+import types
+from collections import OrderedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class DAObject(object):
+    _anonymous = [0]
+
+    def __init__(self, *pargs, **kwargs):
+        if pargs and isinstance(pargs[0], str):
+            self.instanceName = pargs[0]
+            self.has_nonrandom_instance_name = True
+            pargs = pargs[1:]
+        else:
+            DAObject._anonymous[0] += 1
+            self.instanceName = '_internal_' + str(DAObject._anonymous[0])
+            self.has_nonrandom_instance_name = False
+        self.attrList = list()
+        self.init(*pargs, **kwargs)
+
+    def init(self, *pargs, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+class DAList(DAObject):
+    def init(self, *pargs, **kwargs):
+        self.elements = list()
+        self.auto_gather = True
+        self.ask_number = False
+        self.minimum_number = None
+        if 'elements' in kwargs:
+            for element in kwargs['elements']:
+                self.append(element)
+            self.gathered = True
+            del kwargs['elements']
+        if 'object_type' in kwargs:
+            self.object_type = kwargs.pop('object_type')
+        if not hasattr(self, 'object_type'):
+            self.object_type = None
+        super(DAList, self).init(*pargs, **kwargs)
+
+    def _trigger_gather(self):
+        if self.auto_gather and not getattr(self, 'gathered', False):
+            self.gathered = True
+
+    def append(self, *pargs):
+        for item in pargs:
+            self.elements.append(item)
+
+    def extend(self, the_list):
+        self.elements.extend(the_list)
+
+    def appendObject(self, *pargs, **kwargs):
+        item = self.object_type(self.instanceName + '[' + str(len(self.elements)) + ']', *pargs, **kwargs)
+        self.elements.append(item)
+        return item
+
+    def remove(self, *pargs):
+        for item in pargs:
+            if item in self.elements:
+                self.elements.remove(item)
+
+    def insert(self, index, item):
+        self.elements.insert(index, item)
+
+    def pop(self, *pargs):
+        return self.elements.pop(*pargs)
+
+    def clear(self):
+        self.elements = list()
+
+    def __getitem__(self, index):
+        return self.elements[index]
+
+    def __setitem__(self, index, value):
+        self.elements[index] = value
+
+    def __delitem__(self, index):
+        del self.elements[index]
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __iter__(self):
+        self._trigger_gather()
+        return iter(self.elements)
+
+    def number(self):
+        self._trigger_gather()
+        return len(self.elements)
+
+class DADict(DAObject):
+    def init(self, *pargs, **kwargs):
+        self.elements = dict()
+        super(DADict, self).init(*pargs, **kwargs)
+
+    def __getitem__(self, key):
+        return self.elements[key]
+
+    def __setitem__(self, key, value):
+        self.elements[key] = value
+
+    def __delitem__(self, key):
+        del self.elements[key]
+
+    def __contains__(self, key):
+        return key in self.elements
+
+    def __iter__(self):
+        return iter(self.elements)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def keys(self):
+        return self.elements.keys()
+
+    def values(self):
+        return self.elements.values()
+
+    def items(self):
+        return self.elements.items()
+
+    def get(self, key, default=None):
+        return self.elements.get(key, default)
+
+    def update(self, *pargs, **kwargs):
+        self.elements.update(*pargs, **kwargs)
+
+    def pop(self, *pargs):
+        return self.elements.pop(*pargs)
+
+class DAOrderedDict(DADict):
+    def init(self, *pargs, **kwargs):
+        super(DAOrderedDict, self).init(*pargs, **kwargs)
+        self.elements = OrderedDict(self.elements)
+
+class DAEmpty(object):
+    def __eq__(self, other):
+        return isinstance(other, DAEmpty)
+
+    __hash__ = None
+
+class Value(DAObject):
+    pass
+
+class PeriodicValue(Value):
+    pass
+
+class FinancialList(DADict):
+    pass
+
+class PeriodicFinancialList(FinancialList):
+    pass
+
+_language = ['en']
+_language_functions = dict()
+
+def update_language_function(lang, name, func):
+    _language_functions.setdefault(name, dict())[lang] = func
+
+def get_language():
+    return _language[0]
+
+def word(the_word, **kwargs):
+    return the_word
+
+def nice_number(number, capitalize=False):
+    result = str(number)
+    return result.capitalize() if capitalize else result
+
+def log(message, priority='log'):
+    sys.stderr.write(str(message) + "\n")
+
+def install():
+    """Makes docassemble.income.income importable, registering the stand-ins if docassemble is not installed.
+    Returns True if the stand-ins are in use."""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    try:
+        import docassemble.base.core
+        return False
+    except ImportError:
+        pass
+    import docassemble
+    base = types.ModuleType('docassemble.base')
+    base.__path__ = []
+    core = types.ModuleType('docassemble.base.core')
+    util = types.ModuleType('docassemble.base.util')
+    functions = types.ModuleType('docassemble.base.functions')
+    for name in ('DAObject', 'DAList', 'DADict', 'DAOrderedDict', 'DAEmpty'):
+        setattr(core, name, globals()[name])
+        setattr(util, name, globals()[name])
+    for name in ('Value', 'PeriodicValue', 'FinancialList', 'PeriodicFinancialList'):
+        setattr(util, name, globals()[name])
+    for name in ('update_language_function', 'get_language', 'word', 'nice_number', 'log'):
+        setattr(functions, name, globals()[name])
+        setattr(util, name, globals()[name])
+    functions.this_thread = types.SimpleNamespace(current_info=dict())
+    base.core = core
+    base.util = util
+    base.functions = functions
+    docassemble.base = base
+    sys.modules['docassemble.base'] = base
+    sys.modules['docassemble.base.core'] = core
+    sys.modules['docassemble.base.util'] = util
+    sys.modules['docassemble.base.functions'] = functions
+    return True
@@ -0,0 +1,65 @@
+"""Times docassemble.income.batch.generate_statements() with different numbers of worker processes and checks
+that every run produces the same statements in the same order.
+
+    python benchmarks/statements.py [--cases 5000] [--processes 1,2,4]
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+import standin
+
+def random_case(rng):
+    def incomes(count):
+        return [dict(type=rng.choice(['SSI', 'SSDI', 'rent', 'child support']), value=rng.randint(0, 200000) / 100.0,
+                     period=rng.choice([1, 12, 52]), owner='client') for index in range(count)]
+    def jobs(count):
+        return [dict(type='wages', is_hourly=False, value=rng.randint(0, 400000) / 100.0, net=rng.randint(0, 300000) / 100.0,
+                     period=rng.choice([12, 24, 26, 52])) for index in range(count)]
+    return {
+        'client_jobs': jobs(rng.randint(0, 3)),
+        'client_incomes': incomes(rng.randint(0, 4)),
+        'spouse_jobs': jobs(rng.randint(0, 2)),
+        'spouse_incomes': incomes(rng.randint(0, 2)),
+        'household_jobs': jobs(rng.randint(0, 3)),
+        'household_incomes': incomes(rng.randint(0, 3)),
+        'assets': [dict(type=rng.choice(['savings', 'checking', 'cd']), owner=rng.choice(['client', 'spouse']),
+                        balance=rng.randint(0, 10 ** 6) / 100.0, value=rng.randint(0, 1000) / 100.0, period=12)
+                   for index in range(rng.randint(0, 5))],
+        'vehicles': [dict(value=rng.randint(0, 10 ** 6) / 100.0) for index in range(rng.randint(0, 2))],
+        'real_estate': [dict(type='real estate', market_value=rng.randint(0, 10 ** 8) / 100.0, value=0, period=12)
+                        for index in range(rng.randint(0, 1))],
+        'expenses': [dict(type=rng.choice(['rent', 'food', 'utilities', 'medical']), value=rng.randint(0, 300000) / 100.0,
+                          period=12) for index in range(rng.randint(0, 10))],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', type=int, default=5000)
+    parser.add_argument('--processes', default=','.join(str(count) for count in sorted(set([1, 2, multiprocessing.cpu_count()]))))
+    parser.add_argument('--chunksize', type=int, default=64)
+    args = parser.parse_args()
+    stand_ins = standin.install()
+    import docassemble.income.batch as batch
+    rng = random.Random(1)
+    cases = [random_case(rng) for index in range(args.cases)]
+    results = list()
+    reference = None
+    for processes in [int(count) for count in args.processes.split(',')]:
+        start = time.perf_counter()
+        statements = list(batch.generate_statements(cases, processes=processes, chunksize=args.chunksize))
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = statements
+        results.append({'processes': processes, 'cases': args.cases, 'seconds': elapsed,
+                        'cases_per_second': args.cases / elapsed, 'identical': statements == reference})
+        sys.stderr.write("%2d processes: %.3fs\n" % (processes, elapsed))
+    json.dump({'stand_ins': stand_ins, 'cpus': multiprocessing.cpu_count(), 'results': results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    sys.exit(0 if all(result['identical'] for result in results) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+"""Totals for many interview sessions at once, e.g. for eligibility reports across stored interviews, and
+financial statement data for batch exports.
+
+pack() reads the items of many IncomeList, JobList or AssetList objects (or lists of dictionaries with the same
+attributes, such as exported records) into parallel arrays of fixed-point integers (cents by default), and
+PackedSessions.totals() adds them up by session and by type and/or owner in one vectorized step. NumPy is used
+when it is installed; otherwise the same arrays are summed in plain Python.
+
+Totals are Decimals rounded to the cent (half up) and match the per-object methods rounded the same way, e.g.
+IncomeList.total(period_to_use=12, type='SSI', owner=client) for the 'SSI' and client group. A session with an
+amount that is not a whole number of fixed-point units falls back to exact Decimal arithmetic.
+
+statement_data() computes the totals financial_statement_template shows for one case, and generate_statements()
+computes them for many cases in a pool of worker processes.
+"""
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP
+import itertools
+from .core import IncomeRecord, JobRecord, VehicleRecord, to_decimal
+
+_numpy = []
+
+def _load_numpy():
+    """Returns numpy, importing it the first time totals are computed, or None if it is not installed"""
+    if not _numpy:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy.append(numpy)
+    return _numpy[0]
+
+CENT = Decimal('0.01')
+FIELDS = ('amount', 'net', 'balance', 'market_value')
+GROUPINGS = (None, 'type', 'owner', ('type', 'owner'))
+
+def _annual_values(item, fields):
+    """Returns the exact annual amount, net amount, balance and/or market value of an item as Decimals"""
+    if isinstance(item, dict):
+        item = IncomeRecord(**item)
+    values = list()
+    for field in fields:
+        if field == 'amount':
+            values.append(to_decimal(item.amount(period_to_use=1)))
+        elif field == 'net':
+            values.append(to_decimal(item.net_amount(period_to_use=1)))
+        else:
+            values.append(to_decimal(getattr(item, field)))
+    return item, values
+
+def _items(session):
+    if hasattr(session, 'elements'):
+        return session.elements
+    return session
+
+class PackedSessions(object):
+    """The items of many sessions as parallel arrays: session index, type code, owner code and one array of
+    fixed-point integers (value × scale) per field. type_names and owner_names decode the codes."""
+    def __init__(self, fields=('amount',), scale=100):
+        for field in fields:
+            if field not in FIELDS:
+                raise ValueError("Unknown field " + repr(field))
+        self.fields = tuple(fields)
+        self.scale = scale
+        self.session_count = 0
+        self.session = list()
+        self.type = list()
+        self.owner = list()
+        self.units = dict((field, list()) for field in self.fields)
+        self.type_names = list()
+        self.owner_names = list()
+        self._type_codes = dict()
+        self._owner_codes = dict()
+        # Sessions with an amount that is not a whole number of units: session index -> [(type code, owner code, [Decimal, ...])]
+        self.inexact = dict()
+
+    def _code(self, name, codes, names):
+        try:
+            if name not in codes:
+                codes[name] = len(names)
+                names.append(name)
+            return codes[name]
+        except TypeError: # unhashable, e.g. an owner object that defines __eq__
+            for code, known in enumerate(names):
+                if known == name:
+                    return code
+            names.append(name)
+            return len(names) - 1
+
+    def add_session(self, session):
+        """Adds the items of one list (or list of dictionaries) as the next session"""
+        index = self.session_count
+        self.session_count += 1
+        scale = Decimal(self.scale)
+        rows = list()
+        for item in _items(session):
+            item, values = _annual_values(item, self.fields)
+            type_code = self._code(getattr(item, 'type', None), self._type_codes, self.type_names)
+            owner_code = self._code(getattr(item, 'owner', None), self._owner_codes, self.owner_names)
+            rows.append((type_code, owner_code, values))
+        units = [[value * scale for value in values] for type_code, owner_code, values in rows]
+        if all(unit == unit.to_integral_value() for row in units for unit in row):
+            for (type_code, owner_code, values), row in zip(rows, units):
+                self.session.append(index)
+                self.type.append(type_code)
+                self.owner.append(owner_code)
+                for field, unit in zip(self.fields, row):
+                    self.units[field].append(int(unit))
+        else:
+            self.inexact[index] = rows
+        return index
+
+    def _groups(self, by, type_codes, owner_codes):
+        if by is None:
+            return [0] * len(type_codes)
+        if by == 'type':
+            return type_codes
+        if by == 'owner':
+            return owner_codes
+        owner_count = len(self.owner_names)
+        return [type_code * owner_count + owner_code for type_code, owner_code in zip(type_codes, owner_codes)]
+
+    def _key(self, by, group):
+        if by == 'type':
+            return self.type_names[group]
+        if by == 'owner':
+            return self.owner_names[group]
+        owner_count = len(self.owner_names)
+        return (self.type_names[group // owner_count], self.owner_names[group % owner_count])
+
+    def _sum_units(self, field, groups):
+        """Returns {(session, group): total units} for the exactly packed sessions"""
+        numpy = _load_numpy()
+        if numpy is not None and len(groups):
+            try:
+                units = numpy.asarray(self.units[field], dtype=numpy.int64)
+            except OverflowError:
+                units = None
+            if units is not None:
+                sessions = numpy.asarray(self.session, dtype=numpy.int64)
+                groups = numpy.asarray(groups, dtype=numpy.int64)
+                group_count = int(groups.max()) + 1
+                keys = sessions * group_count + groups
+                present, inverse = numpy.unique(keys, return_inverse=True)
+                sums = numpy.zeros(len(present), dtype=numpy.int64)
+                numpy.add.at(sums, inverse, units)
+                return dict(((int(key) // group_count, int(key) % group_count), int(total)) for key, total in zip(present, sums))
+        sums = dict()
+        for session, group, unit in zip(self.session, groups, self.units[field]):
+            key = (session, group)
+            sums[key] = sums.get(key, 0) + unit
+        return sums
+
+    def totals(self, period_to_use=1, by='type', field='amount'):
+        """Returns a list with one entry per session, in the order the sessions were added. If by is None the entry
+        is the session's total; otherwise it is a dictionary from type, owner or (type, owner) to the total for that
+        group. Groups with no items are left out."""
+        if by not in GROUPINGS and by != ['type', 'owner']:
+            raise ValueError("by must be None, 'type', 'owner' or ('type', 'owner')")
+        if by == ['type', 'owner']:
+            by = ('type', 'owner')
+        position = self.fields.index(field)
+        divisor = Decimal(self.scale) * to_decimal(period_to_use) if period_to_use != 0 else None
+        results = [Decimal(0) if by is None else dict() for index in range(self.session_count)]
+        def store(session, group, total):
+            if divisor is None:
+                total = Decimal(0)
+            else:
+                total = (total / divisor).quantize(CENT, rounding=ROUND_HALF_UP)
+            if by is None:
+                results[session] = total
+            else:
+                results[session][self._key(by, group)] = total
+        groups = self._groups(by, self.type, self.owner)
+        for (session, group), total in self._sum_units(field, groups).items():
+            store(session, group, Decimal(total))
+        scale = Decimal(self.scale)
+        for session, rows in self.inexact.items():
+            session_groups = self._groups(by, [row[0] for row in rows], [row[1] for row in rows])
+            sums = dict()
+            for group, row in zip(session_groups, rows):
+                sums[group] = sums.get(group, Decimal(0)) + row[2][position] * scale
+            for group, total in sums.items():
+                store(session, group, total)
+        return results
+
+def pack(sessions, fields=('amount',), scale=100):
+    """Packs the items of each session (an IncomeList, JobList or AssetList, or a list of dictionaries) into a PackedSessions"""
+    packed = PackedSessions(fields=fields, scale=scale)
+    for session in sessions:
+        packed.add_session(session)
+    return packed
+
+def batch_totals(sessions, period_to_use=1, by='type', field='amount', scale=100):
+    """Returns the totals of field ('amount', 'net', 'balance' or 'market_value') for each session, grouped by
+    None, 'type', 'owner' or ('type', 'owner'). See PackedSessions.totals()."""
+    if not isinstance(sessions, PackedSessions):
+        sessions = pack(sessions, fields=(field,), scale=scale)
+    return sessions.totals(period_to_use=period_to_use, by=by, field=field)
+
+# The lists that make up a financial statement, as used by financial_statement.yml
+STATEMENT_PEOPLE = ('client', 'spouse', 'household')
+STATEMENT_LISTS = tuple(person + '_' + kind for person in STATEMENT_PEOPLE for kind in ('jobs', 'incomes')) + ('assets', 'vehicles', 'real_estate', 'expenses')
+
+def _statement_items(case, name):
+    """Returns the items of one of the STATEMENT_LISTS in case, turning dictionaries into compact records"""
+    if name == 'vehicles':
+        record_type = VehicleRecord
+    elif name.endswith('_jobs'):
+        record_type = JobRecord
+    else:
+        record_type = IncomeRecord
+    return [record_type(**item) if isinstance(item, dict) else item for item in _items(case.get(name) or ())]
+
+def _sum(values):
+    result = Decimal(0)
+    for value in values:
+        result += to_decimal(value)
+    return result
+
+def _annual_by_type(items, amount):
+    """Returns an ordered {type: exact annual total} for items, where amount(item) is an item's annual amount"""
+    totals = OrderedDict()
+    for item in items:
+        totals[item.type] = totals.get(item.type, Decimal(0)) + to_decimal(amount(item))
+    return totals
+
+def _per(total, period_to_use):
+    return total / period_to_use if total else Decimal(0)
+
+def statement_data(case):
+    """Returns the totals that financial_statement_template shows, for one case. case is a dictionary whose keys
+    are some of STATEMENT_LISTS (client_jobs, client_incomes, spouse_jobs, ..., assets, vehicles, real_estate,
+    expenses) and whose values are the lists, or lists of dictionaries with the same attributes. Totals are exact
+    Decimals; as with the list methods, annual amounts are added up and divided once for monthly figures."""
+    data = OrderedDict()
+    grand_net_monthly = Decimal(0)
+    for person in STATEMENT_PEOPLE:
+        jobs = _statement_items(case, person + '_jobs')
+        incomes = _statement_items(case, person + '_incomes')
+        net_annual = _sum(job.net_amount(period_to_use=1) for job in jobs)
+        income_by_type = _annual_by_type(incomes, lambda item: item.amount(period_to_use=1))
+        data[person] = OrderedDict([
+            ('jobs_gross_annual', _sum(job.gross_amount(period_to_use=1) for job in jobs)),
+            ('jobs_net_annual', net_annual),
+            ('jobs_net_monthly', _per(net_annual, 12)),
+            ('incomes_annual', _sum(income_by_type.values())),
+            ('incomes_monthly_by_type', OrderedDict((income_type, _per(total, 12)) for income_type, total in income_by_type.items())),
+        ])
+        grand_net_monthly += net_annual
+    data['jobs_net_monthly_total'] = _per(grand_net_monthly, 12)
+    assets = _statement_items(case, 'assets')
+    asset_types = OrderedDict()
+    for asset in assets:
+        entry = asset_types.setdefault(asset.type, {'owners': set(), 'balance': Decimal(0), 'annual_income': Decimal(0)})
+        if hasattr(asset, 'owner'):
+            entry['owners'].add(str(asset.owner))
+        entry['balance'] += to_decimal(getattr(asset, 'balance', 0))
+        entry['annual_income'] += to_decimal(asset.amount(period_to_use=1))
+    data['assets'] = OrderedDict([
+        ('by_type', OrderedDict((asset_type, OrderedDict([('owners', sorted(entry['owners'])),
+                                                          ('balance', entry['balance']),
+                                                          ('annual_income', entry['annual_income']),
+                                                          ('monthly_income', _per(entry['annual_income'], 12))]))
+                                for asset_type, entry in asset_types.items())),
+        ('balance_total', _sum(entry['balance'] for entry in asset_types.values())),
+        ('annual_income_total', _sum(entry['annual_income'] for entry in asset_types.values())),
+    ])
+    data['vehicles_total'] = _sum(vehicle.amount() for vehicle in _statement_items(case, 'vehicles'))
+    real_estate = _statement_items(case, 'real_estate')
+    data['real_estate'] = OrderedDict([
+        ('market_value_total', _sum(getattr(item, 'market_value', 0) for item in real_estate)),
+        ('annual_income_total', _sum(item.amount(period_to_use=1) for item in real_estate)),
+    ])
+    expense_by_type = _annual_by_type(_statement_items(case, 'expenses'), lambda item: item.amount(period_to_use=1))
+    expenses_annual = _sum(expense_by_type.values())
+    data['expenses'] = OrderedDict([
+        ('monthly_by_type', OrderedDict((expense_type, _per(total, 12)) for expense_type, total in expense_by_type.items())),
+        ('annual_total', expenses_annual),
+        ('monthly_total', _per(expenses_annual, 12)),
+    ])
+    return data
+
+def _statement_chunk(cases):
+    return [statement_data(case) for case in cases]
+
+def generate_statements(cases, processes=None, chunksize=16, window=None):
+    """Yields statement_data() for each case in cases, in the same order, computing them in a pool of worker
+    processes (one per CPU by default). cases may be any iterable, such as a generator reading saved interviews;
+    at most window cases (default processes × chunksize × 4) are read ahead, which bounds memory. Cases are sent
+    to the workers in chunks of chunksize. With processes=1 the statements are computed in this process."""
+    import multiprocessing
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if window is None:
+        window = processes * chunksize * 4
+    cases = iter(cases)
+    if processes == 1:
+        for case in cases:
+            yield statement_data(case)
+        return
+    pool = multiprocessing.Pool(processes)
+    try:
+        while True:
+            chunks = list()
+            for start in range(0, window, chunksize):
+                chunk = list(itertools.islice(cases, chunksize))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            if not chunks:
+                break
+            for results in pool.imap(_statement_chunk, chunks):
+                for result in results:
+                    yield result
+    finally:
+        pool.terminate()
+        pool.join()
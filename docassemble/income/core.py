@@ -0,0 +1,1549 @@
+"""The computations behind docassemble.income.income, with no dependency on docassemble: income periods, amounts,
+cached list totals and summaries, ledgers and imports. docassemble.income.income builds its DAObject classes from
+the mixins here, and batch and export use this module directly, so none of them pulls in docassemble.
+
+Outside of an interview (e.g. in a reporting script), the plain lists at the end of this module hold compact
+records and have the same totals as IncomeList, JobList, ValueList and Ledger:
+
+    from docassemble.income.core import PlainIncomeList
+
+    incomes = PlainIncomeList()
+    incomes.appendObject(type='SSI', value=914, period=12)
+    incomes.total(period_to_use=12)
+
+Period labels are translated with docassemble's word() when docassemble is installed, which is only imported the
+first time a label is needed; otherwise they are left in English.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+import bisect
+import csv
+import datetime
+import functools
+import json
+import os
+import threading
+from .instrumentation import instrumented
+
+class _PlainLanguage(object):
+    """Used in place of docassemble.base.functions when docassemble is not installed"""
+    @staticmethod
+    def get_language():
+        return 'en'
+
+    @staticmethod
+    def word(text):
+        return text
+
+    @staticmethod
+    def nice_number(number, capitalize=False):
+        return str(number)
+
+_language_functions = []
+
+def language_functions():
+    """Returns docassemble.base.functions, importing it the first time, or English stand-ins for get_language(),
+    word() and nice_number() if docassemble is not installed"""
+    if not _language_functions:
+        try:
+            import docassemble.base.functions as functions
+        except ImportError:
+            functions = _PlainLanguage
+        _language_functions.append(functions)
+    return _language_functions[0]
+
+def current_interview():
+    """Returns the file name of the interview being run, or None outside of an interview"""
+    try:
+        return language_functions().this_thread.current_info.get('yaml_filename')
+    except AttributeError:
+        return None
+
+class PeriodRegistry(object):
+    """The income periods (number of payments per year) offered in multiple choice questions, with their labels.
+    Lists and labels are built once per language and reused.
+
+    register() changes the periods for the whole process, so call it only when a package module is imported.
+    register_local() adds a custom period, such as 13 for every four weeks, for the current interview only: it is
+    kept in an overlay in front of the shared periods, keyed by the interview's file name."""
+    def __init__(self, periods):
+        self.periods = OrderedDict(periods)
+        self._local_periods = dict()
+        self._overlays = dict()
+        self._lists = dict()
+        self._columns = dict()
+        self._labels = dict()
+        self._by_label = dict()
+        self._factors = dict()
+
+    def _clear(self):
+        self._lists.clear()
+        self._columns.clear()
+        self._labels.clear()
+        self._by_label.clear()
+
+    def register(self, period, label):
+        """Adds a period, or changes the label of an existing one, for every interview in this process"""
+        self.periods[int(period)] = label
+        self._overlays.clear()
+        self._clear()
+
+    def register_local(self, period, label, interview=None):
+        """Adds a period, or changes the label of an existing one, for the current interview (or the given one).
+        Registering the same label again does nothing, so this can run on every request."""
+        if interview is None:
+            interview = current_interview()
+        local_periods = self._local_periods.setdefault(interview, OrderedDict())
+        if local_periods.get(int(period)) != label:
+            local_periods[int(period)] = label
+            self._overlays.pop(interview, None)
+
+    def current(self):
+        """Returns the registry for the current interview: this one, or an overlay with the interview's own periods"""
+        if not self._local_periods:
+            return self
+        interview = current_interview()
+        if interview not in self._local_periods:
+            return self
+        overlay = self._overlays.get(interview)
+        if overlay is None:
+            periods = OrderedDict(self.periods)
+            periods.update(self._local_periods[interview])
+            overlay = self._overlays[interview] = PeriodRegistry(periods.items())
+        return overlay
+
+    def as_list(self, language=None):
+        """Returns the [[period, label], ...] list used for multiple choice questions. The list is shared, so don't change it."""
+        current = self.current()
+        if current is not self:
+            return current.as_list(language)
+        functions = language_functions()
+        if language is None:
+            language = functions.get_language()
+        if language not in self._lists:
+            self._lists[language] = [[period, functions.word(label)] for period, label in self.periods.items()]
+        return self._lists[language]
+
+    def column(self, the_list, index):
+        """Returns the cached flatten(the_list, index) if the_list is one of this registry's lists, otherwise None"""
+        current = self.current()
+        if current is not self:
+            return current.column(the_list, index)
+        for language, period_list in self._lists.items():
+            if period_list is the_list:
+                key = (language, index)
+                if key not in self._columns:
+                    self._columns[key] = [item[index] for item in period_list]
+                return self._columns[key]
+        return None
+
+    def label(self, period):
+        """Returns the lowercase label of a period, e.g. 'monthly', or 'Thirteen times per year' for a period that isn't registered"""
+        current = self.current()
+        if current is not self:
+            return current.label(period)
+        functions = language_functions()
+        key = (functions.get_language(), period)
+        if key not in self._labels:
+            if period in self.periods:
+                self._labels[key] = functions.word(self.periods[period]).lower()
+            else:
+                self._labels[key] = functions.nice_number(period, capitalize=True) + " " + functions.word("times per year")
+        return self._labels[key]
+
+    def period(self, label):
+        """Returns the period with the given label (in any case), or None"""
+        current = self.current()
+        if current is not self:
+            return current.period(label)
+        functions = language_functions()
+        language = functions.get_language()
+        if language not in self._by_label:
+            self._by_label[language] = dict((functions.word(period_label).lower(), period) for period, period_label in self.periods.items())
+        return self._by_label[language].get(str(label).strip().lower())
+
+    def factor(self, from_period, to_period):
+        """Returns the Decimal to multiply an amount paid from_period times a year by to express it per to_period"""
+        key = (from_period, to_period)
+        if key not in self._factors:
+            self._factors[key] = to_decimal(from_period) / to_decimal(to_period)
+        return self._factors[key]
+
+    def convert(self, amount, from_period, to_period):
+        """Converts an amount paid from_period times a year to the equivalent amount paid to_period times a year"""
+        return to_decimal(amount) * self.factor(from_period, to_period)
+
+income_periods = PeriodRegistry([
+    (12, "Monthly"),
+    (1, "Yearly"),
+    (52, "Weekly"),
+    (24, "Twice per month"),
+    (26, "Once every two weeks"),
+    (4, "Once every 3 months")
+])
+
+# Attributes of a list item that feed into one of the list totals. Setting or deleting one of them marks every
+# cached total as stale.
+TRACKED_ATTRIBUTES = frozenset(['value', 'period', 'hourly_rate', 'hours_per_period', 'is_hourly', 'net',
+                                'balance', 'market_value', 'type', 'owner', 'transaction_type', 'date'])
+
+_edit_lock = threading.Lock()
+_edit_epoch = 0
+
+def _record_edit():
+    global _edit_epoch
+    with _edit_lock:
+        _edit_epoch += 1
+
+cache_stats = {'hits': 0, 'misses': 0}
+
+def _state_without(state, *names):
+    """Returns a copy of the pickle state without the named (cache) attributes"""
+    if isinstance(state, dict) and any(name in state for name in names):
+        state = dict(state)
+        for name in names:
+            state.pop(name, None)
+    return state
+
+class TrackedItem(object):
+    """Mixin for list items whose totals can be cached by the list holding them. Changing one of the
+    TRACKED_ATTRIBUTES tells every list that its cached totals are stale, and clears the item's own cache."""
+    __slots__ = ()
+
+    def __setattr__(self, key, value):
+        if key in TRACKED_ATTRIBUTES:
+            _record_edit()
+            self.__dict__.pop('_cache', None)
+        super(TrackedItem, self).__setattr__(key, value)
+
+    def __delattr__(self, key):
+        if key in TRACKED_ATTRIBUTES:
+            _record_edit()
+            self.__dict__.pop('_cache', None)
+        super(TrackedItem, self).__delattr__(key)
+
+    def _cached(self, key, compute):
+        cache = self.__dict__.get('_cache')
+        if cache is None:
+            cache = self.__dict__['_cache'] = dict()
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
+    def __getstate__(self):
+        parent = getattr(super(TrackedItem, self), '__getstate__', None)
+        return _state_without(parent() if parent is not None else self.__dict__, '_cache')
+
+def to_decimal(number):
+    """Converts a number to a Decimal. Floats go through their shortest string form, so a currency
+    field entered as 12.10 becomes exactly Decimal('12.10') rather than its binary approximation."""
+    if isinstance(number, Decimal):
+        return number
+    if isinstance(number, float):
+        return Decimal(repr(number))
+    return Decimal(number)
+
+def _freeze(value):
+    if isinstance(value, (list, set)):
+        return tuple(value)
+    return value
+
+def _cache_key(name, pargs, kwargs):
+    return (name,) + tuple(_freeze(arg) for arg in pargs) + tuple(sorted((key, _freeze(value)) for key, value in kwargs.items()))
+
+def _memoized(gather=True, copy=False):
+    """Decorator for list aggregation methods. Results are cached by method name and arguments until the list is
+    changed (see CachedList). If gather is True, the list is gathered before the cache is consulted, and the
+    method can also be evaluated over the complete items only with CachedList.partial(). If copy is True, the
+    result is mutable and each caller gets its own copy() of the cached value."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *pargs, **kwargs):
+            if gather:
+                self._trigger_gather()
+            result = self._cached(_cache_key(method.__name__, pargs, kwargs), lambda: method(self, *pargs, **kwargs))
+            return result.copy() if copy else result
+        wrapper._aggregate = method if gather else None
+        wrapper._copy = copy
+        return wrapper
+    return decorator
+
+class PartialTotal(object):
+    """The result of CachedList.partial(): a total over the items that are complete so far.
+    value is the total, count the number of items included and pending the items left out because an attribute
+    the total needs is not defined yet. complete is True once the list is gathered and nothing is pending."""
+    def __init__(self, value, count, pending, gathered):
+        self.value = value
+        self.count = count
+        self.pending = pending
+        self.gathered = gathered
+
+    @property
+    def complete(self):
+        return self.gathered and not self.pending
+
+    def __str__(self):
+        return str(self.value)
+
+class CachedList(object):
+    """Mixin for DALists that memoizes their totals. Cached values are thrown away when an element is added, removed
+    or replaced, when a tracked attribute of any TrackedItem changes, and when the list is pickled, so the cache
+    never ends up in the stored interview answers. Lists holding items that are not TrackedItems are never cached.
+
+    Adding, removing or replacing elements through the list's own methods counts as a change; code that changes
+    self.elements directly must call _invalidate_cache() afterwards."""
+    def _cache_stamp(self):
+        return (_edit_epoch, self.__dict__.get('_version', 0), len(self.elements), id(self.elements))
+
+    def _cached(self, key, compute):
+        cache = self.__dict__.get('_cache')
+        if cache is None or cache['stamp'] != self._cache_stamp():
+            cache = {'stamp': self._cache_stamp(),
+                     'enabled': all(isinstance(item, TrackedItem) for item in self.elements),
+                     'values': dict(),
+                     'hits': cache['hits'] if cache else 0,
+                     'misses': cache['misses'] if cache else 0}
+            self.__dict__['_cache'] = cache
+        try:
+            if key in cache['values']:
+                cache['hits'] += 1
+                cache_stats['hits'] += 1
+                return cache['values'][key]
+        except TypeError: # unhashable argument, e.g. an owner object
+            cache['misses'] += 1
+            cache_stats['misses'] += 1
+            return compute()
+        cache['misses'] += 1
+        cache_stats['misses'] += 1
+        result = compute()
+        if cache['enabled'] and cache['stamp'] == self._cache_stamp():
+            cache['values'][key] = result
+        return result
+
+    def _changed(self):
+        """Marks the elements as changed, so cached values are recomputed the next time they are asked for"""
+        self.__dict__['_version'] = self.__dict__.get('_version', 0) + 1
+
+    def _invalidate_cache(self):
+        self.__dict__.pop('_cache', None)
+        self._changed()
+
+    @instrumented(sized=True)
+    def partial(self, name='total', *pargs, **kwargs):
+        """Evaluates the named total (e.g. 'total', 'net_total', 'balance_total' or 'summarize') over the items that
+        are complete so far, without gathering the list or asking for the attributes of unfinished items, and
+        returns a PartialTotal. Other arguments are passed to the total, e.g. partial('total', 12, type='wages').
+        Use this to show a running total on a screen that is reached while the list is still being gathered."""
+        wrapper = getattr(type(self), name, None)
+        method = getattr(wrapper, '_aggregate', None)
+        if method is None:
+            raise ValueError(repr(name) + " is not a total that can be computed partially")
+        value, count, pending = self._cached(_cache_key('partial', (name,) + pargs, kwargs),
+                                             lambda: self._compute_partial(method, pargs, kwargs))
+        if getattr(wrapper, '_copy', False):
+            value = value.copy()
+        return PartialTotal(value, count, list(pending), bool(getattr(self, 'gathered', False)))
+
+    def _compute_partial(self, method, pargs, kwargs):
+        # An item is complete if the total can be computed for it alone; a missing attribute raises an
+        # AttributeError (in docassemble, DAAttributeError) rather than asking a question, as nothing is gathered.
+        view = type(self)(elements=[])
+        complete = list()
+        pending = list()
+        for item in self.elements:
+            view.elements = [item]
+            try:
+                method(view, *pargs, **kwargs)
+            except (AttributeError, NameError):
+                pending.append(item)
+            else:
+                complete.append(item)
+        view.elements = complete
+        return method(view, *pargs, **kwargs), len(complete), pending
+
+    def compact(self):
+        """Replaces the items in the list with compact records of the list's record_type, which take less memory
+        and make the stored interview answers smaller. Returns the number of items converted. Only use this once
+        the items are complete, since records cannot trigger docassemble questions."""
+        converted = 0
+        for index, item in enumerate(self.elements):
+            if not isinstance(item, CompactRecord):
+                self.elements[index] = self.record_type.from_object(item)
+                converted += 1
+        self._invalidate_cache()
+        return converted
+
+    def cache_info(self):
+        """Returns the number of cache hits and misses for this list, and the number of values currently cached"""
+        cache = self.__dict__.get('_cache')
+        if cache is None:
+            return {'hits': 0, 'misses': 0, 'size': 0}
+        return {'hits': cache['hits'], 'misses': cache['misses'], 'size': len(cache['values'])}
+
+    def __setitem__(self, index, value):
+        self._invalidate_cache()
+        return super(CachedList, self).__setitem__(index, value)
+
+    def __delitem__(self, index):
+        self._invalidate_cache()
+        return super(CachedList, self).__delitem__(index)
+
+    def append(self, *pargs, **kwargs):
+        try:
+            return super(CachedList, self).append(*pargs, **kwargs)
+        finally:
+            self._changed()
+
+    def appendObject(self, *pargs, **kwargs):
+        try:
+            return super(CachedList, self).appendObject(*pargs, **kwargs)
+        finally:
+            self._changed()
+
+    def extend(self, *pargs, **kwargs):
+        try:
+            return super(CachedList, self).extend(*pargs, **kwargs)
+        finally:
+            self._changed()
+
+    def insert(self, *pargs, **kwargs):
+        try:
+            return super(CachedList, self).insert(*pargs, **kwargs)
+        finally:
+            self._changed()
+
+    def remove(self, *pargs, **kwargs):
+        try:
+            return super(CachedList, self).remove(*pargs, **kwargs)
+        finally:
+            self._changed()
+
+    def pop(self, *pargs, **kwargs):
+        try:
+            return super(CachedList, self).pop(*pargs, **kwargs)
+        finally:
+            self._changed()
+
+    def clear(self, *pargs, **kwargs):
+        try:
+            return super(CachedList, self).clear(*pargs, **kwargs)
+        finally:
+            self._changed()
+
+    # Attributes that are rebuilt on demand and are left out of the pickled state
+    _transient_attributes = ('_cache', '_version')
+
+    def __getstate__(self):
+        parent = getattr(super(CachedList, self), '__getstate__', None)
+        return _state_without(parent() if parent is not None else self.__dict__, *self._transient_attributes)
+
+SUMMARY_FIELDS = ('total', 'balance', 'market_value')
+
+class TypeSummary(object):
+    """Totals for the items of a single type in a list, as computed by summarize()"""
+    def __init__(self, type=None):
+        self.type = type
+        self.count = 0
+        self.total = 0
+        self.balance = 0
+        self.market_value = 0
+        self.owners = set()
+        self.by_owner = OrderedDict()
+
+    def __str__(self):
+        return str(self.total)
+
+    def copy(self):
+        """Returns a copy that can be changed without affecting this summary"""
+        result = TypeSummary(self.type)
+        result.__dict__.update(self.__dict__)
+        result.owners = set(self.owners)
+        result.by_owner = OrderedDict((owner, summary.copy()) for owner, summary in self.by_owner.items())
+        return result
+
+class IncomeSummary(OrderedDict):
+    """Maps each type found in a list to a TypeSummary. Looking up a type that is not in the list returns an empty summary,
+    so a table can be built from a fixed list of types such as asset_type_list().keys()"""
+    def __missing__(self, type):
+        return TypeSummary(type)
+
+    def rows(self, types=None):
+        """Returns a list of TypeSummary objects in the order of types, for use as the rows of a table. Defaults to the types in the list."""
+        if types is None:
+            return list(self.values())
+        return [self[type] for type in types]
+
+    def copy(self):
+        """Returns a copy, with copies of the TypeSummary objects, that can be changed without affecting this summary"""
+        return IncomeSummary((type, summary.copy()) for type, summary in self.items())
+
+    def grand_total(self, field='total'):
+        """Returns the sum of the specified field across all types"""
+        result = 0
+        for summary in self.values():
+            result += getattr(summary, field)
+        return result
+
+def summary_rows(types, *summaries):
+    """Returns a list of [type, summary, summary...] rows combining several IncomeSummary objects, e.g. one each for the client,
+    spouse and household, so that a single table can show them side by side"""
+    return [[type] + [summary[type] for summary in summaries] for type in types]
+
+def _per_period(annual_total, period_to_use):
+    """Converts a sum of annual amounts to the given period with a single division, so a total is the exact sum
+    divided once rather than a sum of separately rounded per-item amounts"""
+    if not annual_total:
+        return annual_total
+    return annual_total / to_decimal(period_to_use)
+
+def _summarize(items, amount, fields=None, by_owner=False, period_to_use=None):
+    """Groups items by type in a single pass, adding up the requested fields. amount is a function returning the
+    annual amount of an item, which is converted to period_to_use (if given) once per group."""
+    if fields is None:
+        fields = ('total',)
+    for field in fields:
+        if field not in SUMMARY_FIELDS:
+            raise ValueError("Unknown summary field " + repr(field))
+    want_total = 'total' in fields
+    want_balance = 'balance' in fields
+    want_market_value = 'market_value' in fields
+    result = IncomeSummary()
+    for item in items:
+        summary = result.get(item.type)
+        if summary is None:
+            summary = result[item.type] = TypeSummary(item.type)
+        summaries = [summary]
+        if hasattr(item, 'owner'):
+            summary.owners.add(item.owner)
+            if by_owner:
+                if item.owner not in summary.by_owner:
+                    summary.by_owner[item.owner] = TypeSummary(item.type)
+                    summary.by_owner[item.owner].owners.add(item.owner)
+                summaries.append(summary.by_owner[item.owner])
+        if want_total:
+            value = amount(item)
+        if want_balance:
+            balance = Decimal(item.balance)
+        if want_market_value:
+            market_value = Decimal(item.market_value)
+        for summary in summaries:
+            summary.count += 1
+            if want_total:
+                summary.total += value
+            if want_balance:
+                summary.balance += balance
+            if want_market_value:
+                summary.market_value += market_value
+    if want_total and period_to_use:
+        for summary in result.values():
+            summary.total = _per_period(summary.total, period_to_use)
+            for owner_summary in summary.by_owner.values():
+                owner_summary.total = _per_period(owner_summary.total, period_to_use)
+    return result
+
+class IncomeAmount(object):
+    """Amount methods of an Income, for classes that set value and period, or is_hourly, hourly_rate,
+    hours_per_period and period, and provide _cached()"""
+    __slots__ = ()
+
+    def annual_amount(self):
+        """Returns the exact amount earned over a year"""
+        return self._cached('annual', self._compute_annual_amount)
+
+    def _compute_annual_amount(self):
+        if hasattr(self, 'is_hourly') and self.is_hourly:
+            return to_decimal(self.hourly_rate) * to_decimal(self.hours_per_period) * to_decimal(self.period)
+        return to_decimal(self.value) * to_decimal(self.period)
+
+    @instrumented(name='Income.amount')
+    def amount(self, period_to_use=1):
+        """Returns the amount earned over the specified period """
+        return self.annual_amount() / to_decimal(period_to_use)
+
+class JobAmount(object):
+    """Net and gross amount methods of a Job"""
+    __slots__ = ()
+
+    def annual_net_amount(self):
+        """Returns the exact net amount over a year"""
+        return self._cached('annual_net', lambda: to_decimal(self.net) * to_decimal(self.period))
+
+    @instrumented(name='Job.net_amount')
+    def net_amount(self, period_to_use=1):
+        """Returns the net amount (e.g., minus deductions). Only applies if value is non-hourly."""
+        return self.annual_net_amount() / to_decimal(period_to_use)
+ 
+    def gross_amount(self, period_to_use=1):
+        """Gross amount is identical to value"""
+        return self.amount(period_to_use = period_to_use)
+
+class JobDetails(object):
+    """Employer and hours methods of a Job"""
+    __slots__ = ()
+
+    def name_address_phone(self):
+        """Returns concatenation of name, address and phone number of employer"""
+        return self.employer + ': ' + self.employer_address + ', ' + self.employer_phone
+
+    def normalized_hours(self, period_to_use):
+        """Returns the number of hours worked in a given period"""
+        return (float(self.hours_per_period) * int(self.period)) / int(period_to_use)
+
+class ValueAmount(object):
+    """Amount method of a SimpleValue, which may be an expense (transaction_type 'expense')"""
+    __slots__ = ()
+
+    @instrumented(name='SimpleValue.amount')
+    def amount(self):
+        """If desired, to use as a ledger, values can be signed. setting transaction_type = 'expense' makes the value negative. Use min=0 in that case."""
+        if hasattr(self, 'transaction_type'):
+            return (self.value * -1) if (self.transaction_type == 'expense') else self.value
+        else:
+            return self.value
+
+    def __str__(self):
+        return str(self.amount())
+
+class VehicleDetails(object):
+    """The year_make_model() method of a Vehicle"""
+    __slots__ = ()
+
+    def year_make_model(self):
+        return self.year + ' / ' + self.make + ' / ' + self.model
+
+def _restore_record(record_type, mask, values, extra):
+    record = record_type()
+    values = iter(values)
+    for position, name in enumerate(record_type.fields):
+        if mask & (1 << position):
+            object.__setattr__(record, name, next(values))
+    object.__setattr__(record, '_extra', extra)
+    return record
+
+class CompactRecord(TrackedItem):
+    """Base class for the slotted records that compact lists store instead of full DAObjects. The numeric and
+    grouping fields live in __slots__, anything else in a small dictionary, and a record pickles as a bare
+    tuple of its values. Records behave like the objects they replace in templates, but since they are not
+    DAObjects they cannot trigger docassemble questions, so only use them for fully known items such as imports."""
+    __slots__ = ('_cache', '_extra')
+    fields = ()
+    _field_names = frozenset()
+
+    def __init__(self, *pargs, **kwargs):
+        object.__setattr__(self, '_cache', None)
+        object.__setattr__(self, '_extra', None)
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def __setattr__(self, key, value):
+        if key in TRACKED_ATTRIBUTES:
+            _record_edit()
+            object.__setattr__(self, '_cache', None)
+        if key in self._field_names:
+            object.__setattr__(self, key, value)
+        else:
+            if self._extra is None:
+                object.__setattr__(self, '_extra', dict())
+            self._extra[key] = value
+
+    def __delattr__(self, key):
+        if key in TRACKED_ATTRIBUTES:
+            _record_edit()
+            object.__setattr__(self, '_cache', None)
+        if key in self._field_names:
+            object.__delattr__(self, key)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise AttributeError(key)
+
+    def __getattr__(self, key):
+        extra = object.__getattribute__(self, '_extra')
+        if extra is not None and key in extra:
+            return extra[key]
+        raise AttributeError(key)
+
+    def _cached(self, key, compute):
+        if self._cache is None:
+            object.__setattr__(self, '_cache', dict())
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def __reduce__(self):
+        mask = 0
+        values = list()
+        for position, name in enumerate(self.fields):
+            try:
+                values.append(object.__getattribute__(self, name))
+            except AttributeError:
+                continue
+            mask |= 1 << position
+        return (_restore_record, (self.__class__, mask, tuple(values), self._extra))
+
+    @classmethod
+    def from_object(cls, item):
+        """Returns a record with the same attributes as item, leaving out docassemble's bookkeeping attributes"""
+        record = cls()
+        for key, value in item.__dict__.items():
+            if not key.startswith('_') and key not in ('instanceName', 'attrList', 'has_nonrandom_instance_name'):
+                setattr(record, key, value)
+        return record
+
+class IncomeRecord(JobAmount, IncomeAmount, CompactRecord):
+    """Compact stand-in for an Income, Job or Asset. Like an Asset, a record without a value amounts to 0."""
+    fields = ('type', 'owner', 'value', 'period', 'is_hourly', 'hourly_rate', 'hours_per_period', 'net', 'balance', 'market_value')
+    __slots__ = fields
+    _field_names = frozenset(fields)
+
+    def amount(self, period_to_use=1):
+        """Returns the amount earned over the specified period """
+        if not hasattr(self, 'value') and not (hasattr(self, 'is_hourly') and self.is_hourly):
+            return 0
+        return IncomeAmount.amount(self, period_to_use=period_to_use)
+
+class ValueRecord(ValueAmount, CompactRecord):
+    """Compact stand-in for a SimpleValue, e.g. a Ledger entry"""
+    fields = ('type', 'owner', 'value', 'date', 'transaction_type', 'running_total', 'balance', 'market_value')
+    __slots__ = fields
+    _field_names = frozenset(fields)
+
+class JobRecord(JobDetails, IncomeRecord):
+    """Compact stand-in for a Job"""
+    __slots__ = ()
+
+class VehicleRecord(VehicleDetails, ValueRecord):
+    """Compact stand-in for a Vehicle"""
+    __slots__ = ()
+
+# The periods a Ledger can be rolled up by, with the number of them in a year
+ROLLUP_PERIODS = OrderedDict([('week', 52), ('month', 12), ('year', 1)])
+
+def _period_key(date, period):
+    """Returns the key of the week, month or year containing date: (ISO year, ISO week), (year, month) or year"""
+    if period == 'month':
+        return (date.year, date.month)
+    if period == 'week':
+        iso = date.isocalendar()
+        return (iso[0], iso[1])
+    return date.year
+
+def _period_number(key, period):
+    """Numbers consecutive weeks, months or years, so that the number of periods from one key to another is the difference"""
+    if period == 'month':
+        return key[0] * 12 + key[1] - 1
+    if period == 'week':
+        return datetime.date.fromisocalendar(key[0], key[1], 1).toordinal() // 7
+    return key
+
+def _is_expense(entry):
+    return hasattr(entry, 'transaction_type') and entry.transaction_type == 'expense'
+
+class PeriodTotals(object):
+    """The income and expense entries of a Ledger in one week, month or year. expense is a positive amount."""
+    def __init__(self, key=None):
+        self.key = key
+        self.count = 0
+        self.income = 0
+        self.expense = 0
+
+    @property
+    def net(self):
+        return self.income - self.expense
+
+    def __str__(self):
+        return str(self.net)
+
+class LedgerRollup(object):
+    """The entries of a Ledger added up per week, month or year. rows() returns a PeriodTotals for each period that
+    has entries, in date order; looking up a key (e.g. rollup[(2024, 3)] for March 2024) that has none returns an
+    empty one."""
+    def __init__(self, period):
+        self.period = period
+        self.keys = list()
+        self.buckets = dict()
+
+    def add(self, entry):
+        key = _period_key(entry.date, self.period)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = PeriodTotals(key)
+            bisect.insort(self.keys, key)
+        bucket.count += 1
+        if _is_expense(entry):
+            bucket.expense -= to_decimal(entry.amount())
+        else:
+            bucket.income += to_decimal(entry.amount())
+
+    def __getitem__(self, key):
+        if key in self.buckets:
+            return self.buckets[key]
+        return PeriodTotals(key)
+
+    def rows(self):
+        return [self.buckets[key] for key in self.keys]
+
+    def span(self):
+        """Returns the number of periods from the first entry to the last, counting periods without entries"""
+        if not self.keys:
+            return 0
+        return _period_number(self.keys[-1], self.period) - _period_number(self.keys[0], self.period) + 1
+
+    def total(self, field='income'):
+        """Returns the sum of 'income', 'expense' or 'net' over all periods"""
+        result = 0
+        for bucket in self.buckets.values():
+            result += getattr(bucket, field)
+        return result
+
+    def average(self, field='income'):
+        """Returns the average 'income', 'expense' or 'net' per period from the first entry to the last"""
+        span = self.span()
+        if not span:
+            return 0
+        return to_decimal(self.total(field)) / span
+
+class ValueTotals(object):
+    """Totals of a ValueList, for lists of SimpleValues or ValueRecords that also inherit CachedList"""
+    def types(self):
+        """Returns a set of the unique types of values stored in the list. Will fail if any items in the list leave the type field unspecified"""
+        types = set()
+        for item in self.elements:
+            if hasattr(item,'type'):
+                types.add(item.type)
+        return types
+        
+    @instrumented(sized=True)
+    @_memoized()
+    def total(self, type=None):
+        """Returns the total value in the list, gathering the list items if necessary.
+        You can specify type, which may be a list, to coalesce multiple entries of the same type."""
+        result = 0
+        if type is None:
+            for item in self.elements:
+                #if self.elements[item].exists:
+                result += Decimal(item.amount())
+        elif isinstance(type, list):
+            for item in self.elements:
+                if item.type in type:
+                    result += Decimal(item.amount())
+        else:
+            for item in self.elements:
+                if item.type == type:
+                    result += Decimal(item.amount())
+        return result
+
+    @instrumented(sized=True)
+    @_memoized(copy=True)
+    def summarize(self, fields=None, by_owner=False):
+        """Returns an IncomeSummary with the totals for every type in the list, computed in one pass.
+        fields may include 'total', 'balance' and 'market_value'; only 'total' is computed by default.
+        If by_owner is True, each TypeSummary also breaks its totals down by owner."""
+        return _summarize(self.elements, lambda item: Decimal(item.amount()), fields=fields, by_owner=by_owner)
+
+class LedgerMath(ValueTotals):
+    """Running totals, date queries and rollups of a Ledger. income_type is the class to_incomes() creates."""
+    _transient_attributes = ('_cache', '_version', '_dates', '_dates_stamp', '_rollups')
+    income_type = IncomeRecord
+
+    @instrumented(sized=True)
+    def calculate(self):
+        """ Sort the ledger by date, then add a running total to each ledger entry"""
+        self._invalidate_cache()
+        self.elements.sort(key=lambda y: y.date)
+        self._reset_positions()
+        self.__dict__['_dates'] = [entry.date for entry in self.elements]
+        self.__dict__['_rollups'] = dict()
+        self._update_running_totals(0)
+        self.__dict__['_dates_stamp'] = self._cache_stamp()
+
+    def _reset_positions(self):
+        """Renames the entries after they are reordered, so that in docassemble ledger[0] is called ledger[0] and
+        questions about an entry set attributes on that entry. Lists without instance names are left alone."""
+        reset = getattr(self, '_reset_instance_names', None)
+        if reset is not None:
+            reset()
+
+    def _update_running_totals(self, start):
+        """Recomputes the running totals from the entry at position start to the end of the ledger"""
+        running_total = self.elements[start - 1].running_total if start > 0 else 0
+        for index in range(start, len(self.elements)):
+            entry = self.elements[index]
+            running_total += entry.amount()
+            entry.running_total = running_total
+
+    def _sorted_dates(self):
+        """Returns the dates of the entries in order. If the ledger or any of its entries changed since the
+        last calculate() or add_entry(), calculate() is run first."""
+        if self.__dict__.get('_dates_stamp') != self._cache_stamp():
+            self.calculate()
+        return self.__dict__['_dates']
+
+    def insert_entry(self, entry):
+        """Adds an existing entry to the ledger after any entries with the same or an earlier date, and updates
+        the running totals from that point on"""
+        dates = self._sorted_dates()
+        position = bisect.bisect_right(dates, entry.date)
+        dates.insert(position, entry.date)
+        self.elements.insert(position, entry)
+        self._changed()
+        if position < len(self.elements) - 1:
+            self._reset_positions()
+        self._update_running_totals(position)
+        for rollup in self.__dict__['_rollups'].values():
+            rollup.add(entry)
+        self.__dict__['_dates_stamp'] = self._cache_stamp()
+        return entry
+
+    @instrumented(sized=True)
+    def add_entry(self, *pargs, **kwargs):
+        """Creates a new entry, like appendObject(), and adds it to the ledger in date order with its running total.
+        Keyword arguments (e.g. value, date, transaction_type) are set on the new entry."""
+        self._sorted_dates()
+        entry = self.appendObject(*pargs, **kwargs)
+        self.elements.pop()
+        return self._insert_new_entry(entry)
+
+    def _insert_new_entry(self, entry):
+        """Inserts an entry created since the last _sorted_dates(). Setting the new entry's attributes counts as an
+        edit, but does not change the ledger, so the stamp is refreshed instead of sorting the ledger again."""
+        self.__dict__['_dates_stamp'] = self._cache_stamp()
+        return self.insert_entry(entry)
+
+    def balance_as_of(self, date):
+        """Returns the running total after the last entry dated on or before date"""
+        position = bisect.bisect_right(self._sorted_dates(), date)
+        return self.elements[position - 1].running_total if position else 0
+
+    def total_between(self, start, end):
+        """Returns the sum of the entries dated from start through end, inclusive"""
+        dates = self._sorted_dates()
+        first = bisect.bisect_left(dates, start)
+        last = bisect.bisect_right(dates, end)
+        if last <= first:
+            return 0
+        before = self.elements[first - 1].running_total if first else 0
+        return self.elements[last - 1].running_total - before
+
+    @instrumented(sized=True)
+    def rollup(self, period='month'):
+        """Returns a LedgerRollup with the income and expense entries (by transaction_type) added up per 'week', 'month'
+        or 'year'. The rollup is built in one pass the first time it is asked for, and entries added with add_entry()
+        are added to it as they arrive. Entry dates must be dates."""
+        if period not in ROLLUP_PERIODS:
+            raise ValueError("Unknown rollup period " + repr(period))
+        self._sorted_dates()
+        rollups = self.__dict__['_rollups']
+        if period not in rollups:
+            rollup = LedgerRollup(period)
+            for entry in self.elements:
+                rollup.add(entry)
+            rollups[period] = rollup
+        return rollups[period]
+
+    def average(self, period='month', field='income'):
+        """Returns the average 'income', 'expense' or 'net' per week, month or year, from the first entry to the last"""
+        return self.rollup(period).average(field)
+
+    @instrumented(sized=True)
+    @_memoized()
+    def income_estimates(self, transaction_type='income', default_period=12):
+        """Returns an OrderedDict mapping the type of each kind of income entry (or expense entry, with
+        transaction_type='expense') to a (value, period) pair: the average entry, and how many times a year entries
+        of that type recur. The period is the registered income period closest to the median number of days between
+        entries, or default_period for a type with entries on only one date."""
+        dates = OrderedDict()
+        sums = dict()
+        for entry in self.elements:
+            if _is_expense(entry) != (transaction_type == 'expense'):
+                continue
+            type = entry.type if hasattr(entry, 'type') else None
+            if type not in dates:
+                dates[type] = list()
+                sums[type] = 0
+            dates[type].append(entry.date)
+            sums[type] += abs(to_decimal(entry.amount()))
+        results = OrderedDict()
+        for type, type_dates in dates.items():
+            # The ledger may not be sorted yet, e.g. after appendObject()
+            type_dates.sort()
+            gaps = sorted(gap for gap in ((later - earlier).days for earlier, later in zip(type_dates, type_dates[1:])) if gap > 0)
+            if gaps:
+                median = (gaps[(len(gaps) - 1) // 2] + gaps[len(gaps) // 2]) / 2.0
+                period = min(income_periods.current().periods, key=lambda candidate: abs(candidate - 365.25 / median))
+            else:
+                period = default_period
+            results[type] = (sums[type] / len(type_dates), period)
+        return results
+
+    def to_incomes(self, target=None, transaction_type='income', default_period=12):
+        """Converts the ledger into one Income per type of entry, with the average entry as its value and the period
+        from income_estimates(). If target is an IncomeList, the incomes are added to it with appendObject() and
+        target is returned; otherwise a list of new Income objects is returned."""
+        incomes = list()
+        for type, (value, period) in self.income_estimates(transaction_type=transaction_type, default_period=default_period).items():
+            if target is None:
+                incomes.append(self.income_type(type=type, value=value, period=period))
+            else:
+                target.appendObject(type=type, value=value, period=period)
+        return incomes if target is None else target
+
+class IncomeTotals(object):
+    """Totals of an IncomeList, for lists of Income items or IncomeRecords that also inherit CachedList.
+    An owner that is an instance of one of the empty_owner_types matches no item."""
+    empty_owner_types = ()
+
+    @_memoized(gather=False)
+    def _index(self):
+        """Returns dictionaries mapping each type and each owner to the items in the list that have it.
+        Built once and kept with the cached totals until the list changes."""
+        by_type = OrderedDict()
+        by_owner = OrderedDict()
+        owners_by_type = dict()
+        for item in self.elements:
+            has_type = hasattr(item, 'type')
+            if has_type:
+                by_type.setdefault(item.type, []).append(item)
+            if hasattr(item, 'owner'):
+                by_owner.setdefault(item.owner, []).append(item)
+                if has_type:
+                    owners_by_type.setdefault(item.type, set()).add(item.owner)
+        return {'type': by_type, 'owner': by_owner, 'owners_by_type': owners_by_type}
+
+    def types(self):
+        """Returns a set of the unique types of values stored in the list."""
+        return set(self._index()['type'])
+
+    @instrumented(sized=True)
+    def owners(self, type=None):
+        """Returns a set of the unique owners for the specified type of value stored in the list. If type is None, returns all 
+        unique owners in the IncomeList"""
+        index = self._index()
+        if type is None:
+            return set(index['owner'])
+        elif isinstance(type, list):
+            owners = set()
+            for one_type in type:
+                owners.update(index['owners_by_type'].get(one_type, ()))
+            return owners
+        else:
+            return set(index['owners_by_type'].get(type, ()))
+
+    @instrumented(sized=True)
+    def matches(self, type):
+        """Returns a list of the same kind consisting only of elements matching the specified Income type, assisting in filling PDFs with predefined spaces. Type may be a list.
+        The items are looked up in the list's type index, and the result is a new list that can be changed freely."""
+        if isinstance(type, list):
+            items = [item for item in self.elements if hasattr(item, 'type') and item.type in type]
+        else:
+            items = list(self._index()['type'].get(type, ()))
+        view = self.__class__(elements=[])
+        view.elements = items
+        return view
+
+    @instrumented(sized=True)
+    @_memoized()
+    def total(self, period_to_use=1, type=None,owner=None):
+        """Returns the total periodic value in the list, gathering the list items if necessary.
+        You can specify type, which may be a list, to coalesce multiple entries of the same type.
+        Similarly, you can specify owner."""
+        result = 0
+        if period_to_use == 0:
+            return(result)
+        if type is None:
+            for item in self.elements:
+                #if self.elements[item].exists:
+                result += Decimal(item.amount())
+        elif isinstance(type, list):
+            for item in self.elements:
+                if item.type in type:
+                    if owner is None: # if we don't care who the owner is
+                        result += Decimal(item.amount())
+                    else:
+                        if not isinstance(owner, self.empty_owner_types) and item.owner == owner:
+                            result += Decimal(item.amount())
+        else:
+            for item in self.elements:
+                if item.type == type:
+                    if owner is None:
+                        result += Decimal(item.amount())
+                    else:
+                        if not isinstance(owner, self.empty_owner_types) and item.owner == owner:
+                            result += Decimal(item.amount())
+        return _per_period(result, period_to_use)
+    
+    @instrumented(sized=True)
+    @_memoized()
+    def market_value_total(self, type=None):
+        """Returns the total market value of values in the list, gathering the list items if necessary."""
+        result = 0
+        for item in self.elements:
+            if type is None:
+                result += Decimal(item.market_value)
+            elif isinstance(type, list): 
+                if item.type in type:
+                    result += Decimal(item.market_value)
+            else:
+                if item.type == type:
+                    result += Decimal(item.market_value)
+        return result
+
+
+    @instrumented(sized=True)
+    @_memoized()
+    def balance_total(self, type=None):
+        result = 0
+        for item in self.elements:
+            if type is None:
+                result += Decimal(item.balance)
+            elif isinstance(type, list): 
+                if item.type in type:
+                    result += Decimal(item.balance)
+            else:
+                if item.type == type:
+                    result += Decimal(item.balance)
+        return result
+    
+    @instrumented(sized=True)
+    @_memoized(copy=True)
+    def summarize(self, period_to_use=1, fields=None, by_owner=False):
+        """Returns an IncomeSummary with the totals for every type in the list, computed in one pass instead of
+        calling total(), balance_total() and owners() once per type.
+        fields may include 'total', 'balance' and 'market_value'; only 'total' is computed by default.
+        If by_owner is True, each TypeSummary also breaks its totals down by owner."""
+        if period_to_use == 0:
+            amount = lambda item: 0
+        else:
+            amount = lambda item: Decimal(item.amount())
+        return _summarize(self.elements, amount, fields=fields, by_owner=by_owner, period_to_use=period_to_use)
+
+    @instrumented(sized=True)
+    def to_json(self):
+        """Creates income list suitable for Legal Server API. The amount is normalized with amount(), so an hourly job
+        exports its pay per pay period. See docassemble.income.export for streaming and fuller exports."""
+        from .export import iter_json
+        return ''.join(iter_json(self, full=False))
+
+class JobTotals(IncomeTotals):
+    """Gross and net totals of a JobList"""
+    @instrumented(sized=True)
+    @_memoized()
+    def gross_total(self, period_to_use=1, type=None):
+        result = 0
+        if period_to_use == 0:
+            return(result)
+        if type is None:
+            for item in self.elements:
+                #if self.elements[item].exists:
+                result += Decimal(item.gross_amount())
+        elif isinstance(type, list):
+            for item in self.elements:
+                if item.type in type:
+                    result += Decimal(item.gross_amount())
+        else:
+            for item in self.elements:
+                if item.type == type:
+                    result += Decimal(item.gross_amount())
+        return _per_period(result, period_to_use)
+    @instrumented(sized=True)
+    @_memoized()
+    def net_total(self, period_to_use=1, type=None):
+        result = 0
+        if period_to_use == 0:
+            return(result)
+        if type is None:
+            for item in self.elements:
+                #if self.elements[item].exists:
+                result += Decimal(item.net_amount())
+        elif isinstance(type, list):
+            for item in self.elements:
+                if item.type in type:
+                    result += Decimal(item.net_amount())
+        else:
+            for item in self.elements:
+                if item.type == type:
+                    result += Decimal(item.net_amount())
+        return _per_period(result, period_to_use)
+
+class RecordList(object):
+    """A minimal list of records for use outside docassemble. It is always gathered, and appendObject() adds a
+    record of the list's record_type."""
+    record_type = None
+
+    def __init__(self, elements=None, **kwargs):
+        self.elements = list(elements) if elements is not None else list()
+        self.gathered = True
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def _trigger_gather(self):
+        pass
+
+    def append(self, *items):
+        self.elements.extend(items)
+
+    def appendObject(self, *pargs, **kwargs):
+        item = self.record_type(*pargs, **kwargs)
+        self.elements.append(item)
+        return item
+
+    def extend(self, items):
+        self.elements.extend(items)
+
+    def insert(self, index, item):
+        self.elements.insert(index, item)
+
+    def remove(self, *items):
+        for item in items:
+            if item in self.elements:
+                self.elements.remove(item)
+
+    def pop(self, *pargs):
+        return self.elements.pop(*pargs)
+
+    def clear(self):
+        self.elements = list()
+
+    def __iter__(self):
+        return iter(self.elements)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __getitem__(self, index):
+        return self.elements[index]
+
+    def __setitem__(self, index, value):
+        self.elements[index] = value
+
+    def __delitem__(self, index):
+        del self.elements[index]
+
+class PlainIncomeList(IncomeTotals, CachedList, RecordList):
+    """An IncomeList of IncomeRecords that can be used without docassemble"""
+    record_type = IncomeRecord
+
+class PlainJobList(JobTotals, CachedList, RecordList):
+    """A JobList of JobRecords that can be used without docassemble"""
+    record_type = JobRecord
+
+class PlainValueList(ValueTotals, CachedList, RecordList):
+    """A ValueList of ValueRecords that can be used without docassemble"""
+    record_type = ValueRecord
+
+class PlainLedger(LedgerMath, CachedList, RecordList):
+    """A Ledger of ValueRecords that can be used without docassemble"""
+    record_type = ValueRecord
+
+POVERTY_GUIDELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sources', 'poverty_guidelines.json')
+
+_poverty_guidelines = []
+
+def poverty_guidelines():
+    """Returns the poverty guideline table shipped in data/sources/poverty_guidelines.json, read on first use"""
+    if not _poverty_guidelines:
+        with open(POVERTY_GUIDELINES_FILE) as source:
+            _poverty_guidelines.append(json.load(source)['guidelines'])
+    return _poverty_guidelines[0]
+
+def poverty_guideline(household_size, year=None, state=None):
+    """Returns the annual HHS poverty guideline for a household of household_size people, for year (by default the
+    latest year in the table). state is a postal abbreviation: Alaska and Hawaii have their own guidelines, and
+    every other state (or None) uses the one for the 48 contiguous states."""
+    table = poverty_guidelines()
+    if year is None:
+        year = max(table, key=int)
+    if str(year) not in table:
+        raise ValueError("No poverty guidelines for " + str(year))
+    if int(household_size) < 1:
+        raise ValueError("A household has at least one person")
+    guidelines = table[str(year)]
+    region = str(state).strip().upper() if state else 'contiguous'
+    guideline = guidelines.get(region, guidelines['contiguous'])
+    return Decimal(guideline['first_person']) + Decimal(guideline['additional_person']) * (int(household_size) - 1)
+
+# The fields of a household rollup: income from IncomeLists, gross and net pay from JobLists, and all income
+HOUSEHOLD_FIELDS = ('income', 'wages', 'net', 'all')
+
+class HouseholdTotals(object):
+    """Totals across the IncomeList and JobList of every member of a household. members maps a name for each member
+    (e.g. 'client') to an (incomes, jobs) pair, either of which may be None. One pass over all of the lists adds up
+    the annual amounts by member and by type; the result is kept until one of the lists, or one of their items,
+    changes. household_size (by default, the number of members) and state are used for the per-capita and
+    poverty guideline figures."""
+    _transient_attributes = ('_cache',)
+
+    def _trigger_gather(self):
+        pass
+
+    def add_member(self, name, incomes=None, jobs=None):
+        """Adds a member's IncomeList and/or JobList, or replaces them if name is already a member"""
+        self.members[name] = (incomes, jobs)
+
+    def _lists(self):
+        for name, (incomes, jobs) in self.members.items():
+            if incomes is not None:
+                yield name, incomes, False
+            if jobs is not None:
+                yield name, jobs, True
+
+    def size(self):
+        """Returns household_size if it is set, otherwise the number of members"""
+        if hasattr(self, 'household_size'):
+            return int(self.household_size)
+        return len(self.members)
+
+    def _compute_rollup(self):
+        sums = dict()
+        types = OrderedDict()
+        def add(field, person, type, amount):
+            for key in ((field, person, type), (field, person, None), (field, None, type), (field, None, None)):
+                sums[key] = sums.get(key, 0) + amount
+        for name, the_list, is_jobs in self._lists():
+            for item in the_list.elements:
+                types[item.type] = True
+                if is_jobs:
+                    gross = to_decimal(item.gross_amount())
+                    add('wages', name, item.type, gross)
+                    add('net', name, item.type, to_decimal(item.net_amount()))
+                else:
+                    gross = to_decimal(item.amount())
+                    add('income', name, item.type, gross)
+                add('all', name, item.type, gross)
+        return {'sums': sums, 'types': list(types), 'figures': dict()}
+
+    @instrumented(name='HouseholdIncome.rollup')
+    def _rollup(self):
+        """Returns the cached rollup, gathering the member lists and recomputing it if any of them changed"""
+        self._trigger_gather()
+        lists = [the_list for name, the_list, is_jobs in self._lists()]
+        for the_list in lists:
+            the_list._trigger_gather()
+        stamp = (_edit_epoch,) + tuple((id(the_list),) + the_list._cache_stamp() for the_list in lists)
+        cache = self.__dict__.get('_cache')
+        if cache is not None and cache['stamp'] == stamp:
+            cache_stats['hits'] += 1
+            return cache
+        cache_stats['misses'] += 1
+        cache = self._compute_rollup()
+        cache['stamp'] = stamp
+        if all(isinstance(item, TrackedItem) for the_list in lists for item in the_list.elements):
+            self.__dict__['_cache'] = cache
+        return cache
+
+    def _sum(self, field, period_to_use, type, person):
+        if period_to_use == 0:
+            return 0
+        sums = self._rollup()['sums']
+        result = 0
+        for one_person in (person if isinstance(person, list) else [person]):
+            for one_type in (type if isinstance(type, list) else [type]):
+                result += sums.get((field, one_person, one_type), 0)
+        return _per_period(result, period_to_use)
+
+    def total(self, period_to_use=1, type=None, person=None):
+        """Returns the household's total income (from incomes and gross pay from jobs) over the period.
+        type and person (a member name) may be lists."""
+        return self._sum('all', period_to_use, type, person)
+
+    def income_total(self, period_to_use=1, type=None, person=None):
+        """Returns the total of the members' IncomeLists, leaving out jobs"""
+        return self._sum('income', period_to_use, type, person)
+
+    def gross_total(self, period_to_use=1, type=None, person=None):
+        """Returns the gross pay from the members' jobs, like JobList.gross_total()"""
+        return self._sum('wages', period_to_use, type, person)
+
+    def net_total(self, period_to_use=1, type=None, person=None):
+        """Returns the net pay from the members' jobs, like JobList.net_total()"""
+        return self._sum('net', period_to_use, type, person)
+
+    def by_person(self, period_to_use=1, field='all'):
+        """Returns an OrderedDict mapping each member name to their total of field ('all', 'income', 'wages' or 'net')"""
+        if field not in HOUSEHOLD_FIELDS:
+            raise ValueError("Unknown household field " + repr(field))
+        return OrderedDict((name, self._sum(field, period_to_use, None, name)) for name in self.members)
+
+    def by_type(self, period_to_use=1, field='all'):
+        """Returns an OrderedDict mapping each type of income to the household's total of field"""
+        if field not in HOUSEHOLD_FIELDS:
+            raise ValueError("Unknown household field " + repr(field))
+        return OrderedDict((type, self._sum(field, period_to_use, type, None)) for type in self._rollup()['types'])
+
+    def _figure(self, key, compute):
+        figures = self._rollup()['figures']
+        if key not in figures:
+            figures[key] = compute()
+        return figures[key]
+
+    def per_capita(self, period_to_use=1):
+        """Returns the household's total income per person over the period"""
+        size = self.size()
+        if not size:
+            return 0
+        return self._figure(('per capita', period_to_use, size), lambda: _per_period(to_decimal(self.total()) / size, period_to_use))
+
+    def poverty_guideline(self, year=None, state=None):
+        """Returns the annual poverty guideline for the household's size. state defaults to the household's state
+        attribute, if it is set."""
+        if state is None and hasattr(self, 'state'):
+            state = self.state
+        return poverty_guideline(self.size(), year=year, state=state)
+
+    def percent_of_poverty(self, year=None, state=None):
+        """Returns the household's annual income as a percentage of the poverty guideline for its size, e.g. for
+        eligibility thresholds such as 125% or 200% of the guideline"""
+        if state is None and hasattr(self, 'state'):
+            state = self.state
+        size = self.size()
+        return self._figure(('percent of poverty', size, year, state),
+                            lambda: to_decimal(self.total()) * 100 / poverty_guideline(size, year=year, state=state))
+
+    def __getstate__(self):
+        parent = getattr(super(HouseholdTotals, self), '__getstate__', None)
+        return _state_without(parent() if parent is not None else self.__dict__, *self._transient_attributes)
+
+class PlainHousehold(HouseholdTotals):
+    """A HouseholdIncome that can be used without docassemble"""
+    def __init__(self, **kwargs):
+        self.members = OrderedDict()
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+AMOUNT_ATTRIBUTES = ('value', 'net', 'hourly_rate', 'balance', 'market_value')
+NUMBER_ATTRIBUTES = ('period', 'hours_per_period')
+
+class ImportResult(object):
+    """Reports the outcome of import_records(): how many rows were added, and which rows were rejected and why"""
+    def __init__(self):
+        self.imported = 0
+        self.rejected = list()
+
+    def reject(self, row_number, row, reason):
+        self.rejected.append((row_number, row, reason))
+
+    def __str__(self):
+        return str(self.imported) + " imported, " + str(len(self.rejected)) + " rejected"
+
+def parse_amount(text):
+    """Converts an amount such as '$1,234.50' or '(12.00)' to a float, the same type docassemble uses for currency fields"""
+    if isinstance(text, (int, float, Decimal)) and not isinstance(text, bool):
+        number = float(text)
+    else:
+        text = str(text).strip().replace('$', '').replace(',', '')
+        negative = text.startswith('(') and text.endswith(')')
+        if negative:
+            text = text[1:-1]
+        number = float(text)
+        if negative:
+            number = -number
+    if number != number or number in (float('inf'), float('-inf')):
+        raise ValueError("not a finite amount")
+    return number
+
+def parse_date(text, date_format=None):
+    """Converts a date in date_format (ISO 8601 by default) to a datetime"""
+    if isinstance(text, datetime.datetime):
+        return text
+    if isinstance(text, datetime.date):
+        return datetime.datetime(text.year, text.month, text.day)
+    if date_format is None:
+        return datetime.datetime.fromisoformat(str(text).strip())
+    return datetime.datetime.strptime(str(text).strip(), date_format)
+
+def _iterate_rows(source, format):
+    """Yields (row number, row dictionary) pairs from a CSV or JSON lines file, one line at a time"""
+    if format == 'csv':
+        for row_number, row in enumerate(csv.DictReader(source), start=1):
+            yield row_number, row
+    elif format == 'jsonl':
+        for row_number, line in enumerate(source, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = line.rstrip('\r\n')
+                yield row_number, row
+    elif format == 'records':
+        for row_number, row in enumerate(source, start=1):
+            yield row_number, row
+    else:
+        raise ValueError("Unknown import format " + repr(format))
+
+def _convert_row(row, mapping, defaults, date_format, signed):
+    """Returns the attributes for a new list item built from row, or raises ValueError with the reason the row is invalid"""
+    if not isinstance(row, dict):
+        raise ValueError("not a record: " + str(row))
+    attributes = dict(defaults) if defaults else dict()
+    for attribute, column in mapping.items():
+        if column not in row or row[column] is None or (isinstance(row[column], str) and row[column].strip() == ''):
+            continue
+        raw = row[column]
+        try:
+            if attribute in AMOUNT_ATTRIBUTES:
+                attributes[attribute] = parse_amount(raw)
+            elif attribute == 'period' and income_periods.period(raw) is not None:
+                attributes[attribute] = income_periods.period(raw)
+            elif attribute in NUMBER_ATTRIBUTES:
+                attributes[attribute] = int(str(raw).strip())
+            elif attribute == 'date':
+                attributes[attribute] = parse_date(raw, date_format)
+            elif isinstance(raw, str):
+                attributes[attribute] = raw.strip()
+            else:
+                attributes[attribute] = raw
+        except ValueError:
+            raise ValueError("invalid " + attribute + " " + repr(raw))
+    if signed and attributes.get('value', 0) < 0 and 'transaction_type' not in attributes:
+        attributes['value'] = -attributes['value']
+        attributes['transaction_type'] = 'expense'
+    return attributes
+
+def import_records(target, source, format='csv', mapping=None, defaults=None, required=None, date_format=None, signed=False, compact=False):
+    """Streams rows from a bank export or Legal Server income records into a Ledger, ValueList or IncomeList,
+    one row at a time, and returns an ImportResult listing any rejected rows.
+
+    source is a file object (or other iterable of lines) for format 'csv' or 'jsonl', or an iterable of
+    dictionaries for format 'records'. mapping maps attribute names (value, date, type, transaction_type,
+    period, ...) to column names; columns that are not mapped are ignored. defaults are attributes to set on
+    every item, e.g. {'period': 12}. Rows missing one of the required attributes (value, plus date for a Ledger,
+    by default) are rejected. If signed is True, negative amounts become positive values with transaction_type
+    'expense'. If compact is True, rows are stored as the list's compact record_type instead of DAObjects.
+
+    A Ledger is kept sorted with running totals as rows arrive. If the rows are not in date order, the rest are
+    appended and the ledger is sorted once at the end."""
+    is_ledger = isinstance(target, LedgerMath)
+    if mapping is None:
+        mapping = dict((attribute, attribute) for attribute in ('value', 'date', 'type', 'transaction_type', 'period', 'owner'))
+    if required is None:
+        required = ('value', 'date') if is_ledger else ('value',)
+    result = ImportResult()
+    in_order = True
+    for row_number, row in _iterate_rows(source, format):
+        try:
+            attributes = _convert_row(row, mapping, defaults, date_format, signed)
+        except ValueError as err:
+            result.reject(row_number, row, str(err))
+            continue
+        missing = [attribute for attribute in required if attribute not in attributes]
+        if missing:
+            result.reject(row_number, row, "missing " + ", ".join(missing))
+            continue
+        if is_ledger and in_order:
+            dates = target._sorted_dates()
+            if dates and attributes['date'] < dates[-1]:
+                in_order = False
+        if compact:
+            record = target.record_type(**attributes)
+            if is_ledger and in_order:
+                target._insert_new_entry(record)
+            else:
+                target.append(record)
+        elif is_ledger and in_order:
+            target.add_entry(**attributes)
+        else:
+            target.appendObject(**attributes)
+        result.imported += 1
+    if is_ledger and not in_order:
+        target.calculate()
+    return result
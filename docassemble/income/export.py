@@ -0,0 +1,153 @@
+"""Streaming JSON export of income, job, asset and ledger lists, e.g. for the nightly sync to Legal Server, and a
+matching loader.
+
+Records are written one at a time to a file-like object (or yielded as strings), so memory use does not grow
+with the number of records. Amounts are normalized with amount(): "amount" is what is received each period,
+"frequency" is the number of periods per year, so an hourly job exports the pay for each pay period.
+
+    with open('incomes.json', 'w') as output:
+        write_json(client.incomes, output)
+
+    with open('sync.ndjson', 'w') as output:
+        write_ndjson(((case.id, {'incomes': case.incomes, 'jobs': case.jobs}) for case in cases), output)
+
+    with open('sync.ndjson') as source:
+        load_ndjson(source, lambda client, list_name: lists[client][list_name])
+"""
+from decimal import Decimal
+import datetime
+import json
+from .core import ValueAmount, ValueRecord, import_records
+
+# How exported keys map back to item attributes when loading
+INCOME_MAPPING = dict(type='type', period='frequency', value='amount', owner='owner', net='net', is_hourly='is_hourly',
+                      hourly_rate='hourly_rate', hours_per_period='hours_per_period', balance='balance',
+                      market_value='market_value', employer='employer')
+VALUE_MAPPING = dict(type='type', date='date', value='amount', transaction_type='transaction_type', owner='owner',
+                     balance='balance', market_value='market_value')
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+def _dumps(record):
+    return json.dumps(record, default=_json_default)
+
+def _is_value(item):
+    return isinstance(item, ValueAmount)
+
+def income_record(item, full=True):
+    """Returns the export dictionary for an Income, Job or Asset (or compact record). With full=False only type,
+    frequency and amount are included, as in IncomeList.to_json(). An item without a period, such as an asset whose
+    optional period was left blank, is exported with a null frequency and its value as the amount."""
+    frequency = item.period if hasattr(item, 'period') else None
+    if frequency:
+        amount = item.amount(period_to_use=frequency)
+    else:
+        amount = item.value if hasattr(item, 'value') and item.value is not None else 0
+    record = {"type": getattr(item, 'type', None), "frequency": frequency, "amount": amount}
+    if not full:
+        return record
+    if hasattr(item, 'owner'):
+        record["owner"] = item.owner
+    if hasattr(item, 'is_hourly'):
+        record["is_hourly"] = bool(item.is_hourly)
+        if item.is_hourly:
+            record["hourly_rate"] = item.hourly_rate
+            record["hours_per_period"] = item.hours_per_period
+    if hasattr(item, 'net'):
+        record["net"] = item.net
+    if hasattr(item, 'employer'):
+        record["employer"] = item.employer
+    for attribute in ('balance', 'market_value'):
+        if hasattr(item, attribute):
+            record[attribute] = getattr(item, attribute)
+    return record
+
+def value_record(item):
+    """Returns the export dictionary for a SimpleValue, such as a Ledger entry. amount is the unsigned value;
+    transaction_type says whether it is an expense."""
+    record = {"type": getattr(item, 'type', None), "amount": item.value}
+    for attribute in ('date', 'transaction_type', 'owner', 'running_total', 'balance', 'market_value'):
+        if hasattr(item, attribute):
+            record[attribute] = getattr(item, attribute)
+    return record
+
+def iter_records(items, full=True):
+    """Yields the export dictionary for each item of an IncomeList, JobList, AssetList, ValueList or Ledger"""
+    for item in getattr(items, 'elements', items):
+        if _is_value(item):
+            yield value_record(item)
+        else:
+            yield income_record(item, full=full)
+
+def iter_json(items, full=True):
+    """Yields a JSON array of the records of items, piece by piece"""
+    yield '['
+    separator = ''
+    for record in iter_records(items, full=full):
+        yield separator + _dumps(record)
+        separator = ', '
+    yield ']'
+
+def write_json(items, output, full=True):
+    """Writes a JSON array of the records of items to the file-like object output"""
+    for piece in iter_json(items, full=full):
+        output.write(piece)
+
+def iter_ndjson(clients, full=True):
+    """Yields one JSON line per record for many clients. clients is an iterable of (client id, lists) pairs, where
+    lists maps a name (e.g. 'incomes') to a list. Each line has "client" and "list" keys added."""
+    for client, lists in clients:
+        for list_name, items in lists.items():
+            for record in iter_records(items, full=full):
+                record["client"] = client
+                record["list"] = list_name
+                yield _dumps(record) + "\n"
+
+def write_ndjson(clients, output, full=True):
+    """Writes iter_ndjson(clients) to the file-like object output and returns the number of records written"""
+    count = 0
+    for line in iter_ndjson(clients, full=full):
+        output.write(line)
+        count += 1
+    return count
+
+def read_ndjson(source):
+    """Yields the records of an NDJSON export, one line at a time"""
+    for line in source:
+        if line.strip():
+            yield json.loads(line)
+
+def load_records(target, records, compact=False):
+    """Adds exported records (dictionaries) to target, an IncomeList, JobList, AssetList, ValueList or Ledger,
+    and returns the ImportResult"""
+    mapping = VALUE_MAPPING if hasattr(target, 'record_type') and issubclass(target.record_type, ValueRecord) else INCOME_MAPPING
+    return import_records(target, records, format='records', mapping=mapping, compact=compact)
+
+def load_ndjson(source, target_for, compact=False):
+    """Streams an NDJSON export back into lists. target_for(client, list_name) returns the list that the records of
+    that client and list go into. Returns a dictionary of ImportResults keyed by (client, list_name)."""
+    results = dict()
+    batch = list()
+    batch_key = None
+    def flush():
+        if batch:
+            result = load_records(target_for(*batch_key), batch, compact=compact)
+            if batch_key in results:
+                results[batch_key].imported += result.imported
+                results[batch_key].rejected.extend(result.rejected)
+            else:
+                results[batch_key] = result
+    for record in read_ndjson(source):
+        key = (record.get("client"), record.get("list"))
+        if key != batch_key or len(batch) >= 1000:
+            flush()
+            batch = list()
+            batch_key = key
+        batch.append(record)
+    flush()
+    return results
@@ -0,0 +1,127 @@
+"""Opt-in call counts and timings for the income aggregation methods, to find out which tables and templates in
+an interview are expensive.
+
+Instrumentation is off by default, and an instrumented method then only checks a flag before calling through.
+Once enabled, every call records its cumulative (inclusive) time and, for list methods, the number of items in the
+list, grouped by interview session:
+
+    instrumentation.enable()
+    ...
+    instrumentation.report()        # rows for the current session, most expensive first
+    instrumentation.log_report()    # the same as one docassemble log line, then starts counting afresh
+
+In an interview, calling log_report() from a mandatory code block at the top of the interview logs what the
+previous page render cost.
+"""
+from collections import OrderedDict
+import functools
+import json
+import threading
+import time
+
+class Instrumentation(object):
+    """Collects call counts, cumulative time and list sizes per interview session. At most max_sessions
+    sessions are kept; the least recently active one is dropped first."""
+    def __init__(self, max_sessions=100):
+        self.enabled = False
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._session_id = lambda: None
+
+    def enable(self):
+        """Starts recording calls"""
+        try:
+            import docassemble.base.functions
+            self._session_id = docassemble.base.functions.get_uid
+        except (ImportError, AttributeError):
+            self._session_id = lambda: None
+        self.enabled = True
+
+    def disable(self):
+        """Stops recording calls. What was recorded so far is kept until reset()."""
+        self.enabled = False
+
+    def reset(self, session=None):
+        """Forgets what was recorded for a session, or for every session if session is None"""
+        with self._lock:
+            if session is None:
+                self.sessions.clear()
+            else:
+                self.sessions.pop(session, None)
+
+    def current_session(self):
+        """Returns the id of the current interview session, or None outside of an interview"""
+        try:
+            return self._session_id()
+        except Exception:
+            return None
+
+    def record(self, name, seconds, size=None):
+        """Adds one call of name that took seconds (and summed a list of size items) to the current session"""
+        session = self.current_session()
+        with self._lock:
+            stats = self.sessions.pop(session, None)
+            if stats is None:
+                stats = dict()
+                while len(self.sessions) >= self.max_sessions:
+                    self.sessions.popitem(last=False)
+            self.sessions[session] = stats
+            entry = stats.get(name)
+            if entry is None:
+                entry = stats[name] = [0, 0.0, 0, 0]
+            entry[0] += 1
+            entry[1] += seconds
+            if size is not None:
+                entry[2] += size
+                if size > entry[3]:
+                    entry[3] = size
+
+    def report(self, session=None):
+        """Returns a list of rows, one per method, for the current session (or the given one), most expensive first.
+        Each row has name, calls, seconds, items (summed over the calls) and max_items."""
+        if session is None:
+            session = self.current_session()
+        with self._lock:
+            stats = dict(self.sessions.get(session, {}))
+        rows = list()
+        for name, (calls, seconds, items, max_items) in stats.items():
+            rows.append(OrderedDict([('name', name), ('calls', calls), ('seconds', seconds), ('items', items), ('max_items', max_items)]))
+        rows.sort(key=lambda row: row['seconds'], reverse=True)
+        return rows
+
+    def log_report(self, session=None, reset=True):
+        """Writes the report for the current session (or the given one) as a single JSON log line with docassemble's
+        log(), and by default starts counting that session afresh. Returns the report."""
+        if session is None:
+            session = self.current_session()
+        rows = self.report(session)
+        if rows:
+            import docassemble.base.functions
+            docassemble.base.functions.log("income instrumentation " + json.dumps({'session': session, 'calls': rows}))
+        if reset:
+            self.reset(session)
+        return rows
+
+instrumentation = Instrumentation()
+
+def instrumented(sized=False, name=None):
+    """Decorator that records the calls of a function or method with instrumentation while it is enabled, under
+    name (by default, the function's qualified name). If sized is True, the first argument is a list whose number
+    of elements is recorded as well, and calls are recorded under the list's class, e.g. JobList.total."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*pargs, **kwargs):
+            if not instrumentation.enabled:
+                return function(*pargs, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*pargs, **kwargs)
+            finally:
+                if sized:
+                    instrumentation.record(name or type(pargs[0]).__name__ + '.' + function.__name__,
+                                           time.perf_counter() - start, len(pargs[0].elements))
+                else:
+                    instrumentation.record(name or function.__qualname__, time.perf_counter() - start)
+        return wrapper
+    return decorator